@@ -0,0 +1,83 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from settings import HTTP_POOL_SIZE, HTTP_RETRIES, HTTP_BACKOFF
+
+# Общие HTTP-сессии для отправителей: keep-alive и пул соединений,
+# чтобы каждый sendMessage / messages.send не открывал новое TLS-соединение.
+# Одна сессия на платформу ("tg", "vk"); внутри urllib3 держит пул на каждый хост.
+
+_sessions: dict[str, requests.Session] = {}
+_lock = threading.Lock()
+
+
+# Чьи POST можно повторять на 5xx: у VK messages.send защищён random_id (повтор не создаст
+# дубль), а загрузка/сохранение фото просто дадут ещё одно фото. У Telegram дедупликации нет,
+# а 502/504 бывает и после того, как сообщение уже доставлено — там повторяем только
+# ошибки соединения (запрос не ушёл; они повторяются для любого метода).
+_POST_RETRY_ON_5XX = {"vk"}
+
+
+def _retry(name: str) -> Retry:
+    methods = {"GET", "POST"} if name in _POST_RETRY_ON_5XX else {"GET"}
+    return Retry(
+        total=HTTP_RETRIES,
+        connect=HTTP_RETRIES,
+        # read-таймаут на POST не повторяем: запрос мог дойти, получили бы дубль
+        read=0,
+        status=HTTP_RETRIES,
+        # 429 тут не повторяем: его обрабатывает rate limiter по retry_after из ответа
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(methods),
+        backoff_factor=HTTP_BACKOFF,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def get_session(name: str) -> requests.Session:
+    s = _sessions.get(name)
+    if s is not None:
+        return s
+    with _lock:
+        s = _sessions.get(name)
+        if s is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=HTTP_POOL_SIZE, max_retries=_retry(name))
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _sessions[name] = s
+    return s
+
+
+def post(name: str, url: str, **kwargs) -> requests.Response:
+    return get_session(name).post(url, **kwargs)
+
+
+def http_stats() -> dict:
+    """
+    Сколько запросов ушло и сколько соединений для этого пришлось открыть.
+    reused = requests - connections: чем ближе к requests, тем лучше работает keep-alive.
+    """
+    out = {}
+    for name, s in list(_sessions.items()):
+        requests_total = 0
+        connections = 0
+        adapter = s.get_adapter("https://")
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            requests_total += pool.num_requests
+            connections += pool.num_connections
+        out[name] = {
+            "requests": requests_total,
+            "connections": connections,
+            "reused": max(requests_total - connections, 0),
+        }
+    return out
@@ -0,0 +1,107 @@
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    Классический token bucket: rate токенов в секунду, не больше burst в запасе.
+    reserve() сразу "забирает" токен (в долг, если их нет) и говорит,
+    сколько секунд подождать до отправки. Потокобезопасен.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self, n: int = 1) -> float:
+        """Забрать n токенов; вернуть, через сколько секунд можно отправить последний из них."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._stamp) * self.rate)
+            self._stamp = now
+            self._tokens -= float(n)
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._blocked_until - now)
+
+    def blocked_for(self) -> float:
+        with self._lock:
+            return max(0.0, self._blocked_until - time.monotonic())
+
+    def pause(self, seconds: float) -> None:
+        """Платформа сказала "подожди" (retry_after): до этого момента никто не отправляет."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + float(seconds))
+
+    def idle_for(self) -> float:
+        return time.monotonic() - self._stamp
+
+
+class RateLimiter:
+    """
+    Общий лимит на бота + отдельный лимит на каждый чат.
+    per_chat(chat_id) -> (rate, burst) или None, если для этого чата отдельного лимита нет.
+    """
+
+    # корзины чатов, которые давно не использовались, выкидываем
+    _IDLE_SEC = 600
+
+    def __init__(self, rate: float, burst: float, per_chat: Callable[[int], tuple[float, float] | None] | None = None):
+        self._global = TokenBucket(rate, burst)
+        self._per_chat = per_chat
+        self._chats: dict[int, TokenBucket] = {}
+        self._lock = threading.Lock()
+        self._swept_at = time.monotonic()
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket | None:
+        if self._per_chat is None:
+            return None
+        with self._lock:
+            b = self._chats.get(chat_id)
+            if b is None:
+                spec = self._per_chat(chat_id)
+                if spec is None:
+                    return None
+                b = TokenBucket(*spec)
+                self._chats[chat_id] = b
+            self._sweep()
+            return b
+
+    def _sweep(self) -> None:
+        now = time.monotonic()
+        if now - self._swept_at < self._IDLE_SEC:
+            return
+        self._swept_at = now
+        for cid in [cid for cid, b in self._chats.items() if b.idle_for() > self._IDLE_SEC]:
+            self._chats.pop(cid, None)
+
+    def reserve_chat(self, chat_id: int, n: int = 1) -> float:
+        """
+        Заранее забрать n токенов лимита чата; вернуть, сколько секунд подождать.
+        Для вызова из event loop: ждём через asyncio.sleep, а не в потоке отправки,
+        потом отправляем с wait(chat_id, chat_reserved=True).
+        """
+        b = self._chat_bucket(int(chat_id))
+        return b.reserve(n) if b is not None else 0.0
+
+    def wait(self, chat_id: int | None = None, chat_reserved: bool = False) -> None:
+        """
+        Блокирует текущий поток, пока отправка в этот чат не уложится в лимиты.
+        chat_reserved — токен чата уже взят через reserve_chat(), соблюдаем только паузу retry_after.
+        """
+        delay = self._global.reserve()
+        if chat_id is not None:
+            b = self._chat_bucket(int(chat_id))
+            if b is not None:
+                delay = max(delay, b.blocked_for() if chat_reserved else b.reserve())
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, seconds: float, chat_id: int | None = None) -> None:
+        """retry_after от платформы: для чата, если он известен, иначе для всех."""
+        b = self._chat_bucket(int(chat_id)) if chat_id is not None else None
+        (b or self._global).pause(seconds)
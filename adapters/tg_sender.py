@@ -1,40 +1,209 @@
+import logging
 import random
 import time
-import requests
 
+from adapters.http_client import post
+from adapters.rate_limit import RateLimiter
 from core.actions import OutText, OutPhoto
-from settings import TG_TOKEN, TYPING_DELAY_MIN, TYPING_DELAY_MAX
+from core.media_cache import MediaCache
+from settings import (
+    TG_TOKEN,
+    TYPING_DELAY_MIN,
+    TYPING_DELAY_MAX,
+    TG_RATE_GLOBAL,
+    TG_RATE_GROUP_PER_MIN,
+    TG_RATE_PRIVATE,
+    SEND_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+# хеш картинки -> file_id, который Telegram вернул при первой загрузке
+_PHOTO_CACHE = MediaCache("tg_photo_cache")
+
+
+class RateLimited(Exception):
+    """
+    Telegram ответил 429 на отправку из очереди доставки (paced).
+    actions — то, что из списка ещё не отправлено (с действия, на котором упёрлись);
+    очередь доставки ставит их обратно в начало очереди чата.
+    """
+
+    def __init__(self, chat_id: int, actions: list, retry_after: float):
+        super().__init__(f"telegram 429 for chat {chat_id}, retry after {retry_after}s")
+        self.actions = actions
+        self.retry_after = retry_after
+
+
+def _chat_limit(chat_id: int) -> tuple[float, float]:
+    # группы (chat_id < 0): ~20 сообщений в минуту; лички: ~1 в секунду
+    if chat_id < 0:
+        return TG_RATE_GROUP_PER_MIN / 60.0, 3
+    return TG_RATE_PRIVATE, 3
+
+
+_LIMITER = RateLimiter(TG_RATE_GLOBAL, TG_RATE_GLOBAL, per_chat=_chat_limit)
+
+
+def typing_delay_seconds() -> float:
+    return random.uniform(TYPING_DELAY_MIN, TYPING_DELAY_MAX)
 
 
 def _typing_delay():
-    time.sleep(random.uniform(TYPING_DELAY_MIN, TYPING_DELAY_MAX))
+    time.sleep(typing_delay_seconds())
 
 
-def send_actions_tg(chat_id: int, actions):
-    if not actions:
-        return
+def chat_send_delay(chat_id: int, count: int) -> float:
+    """
+    Забрать лимит чата под count сообщений и вернуть, сколько подождать (для event loop).
+    После этого отправлять через deliver_actions_tg(..., paced=True).
+    """
+    return _LIMITER.reserve_chat(chat_id, count)
 
-    # typing один раз
-    requests.post(
+
+def _retry_after(r) -> float:
+    try:
+        return float(r.json().get("parameters", {}).get("retry_after", 1))
+    except ValueError:
+        return 1.0
+
+
+def _tg_send(method: str, chat_id: int, paced: bool = False, **kwargs):
+    """
+    Отправка с учётом лимитов Telegram.
+
+    paced — вызов из очереди доставки: лимит чата уже взят через chat_send_delay, и на 429
+    сразу возвращаем ответ (deliver_actions_tg бросит RateLimited, очередь подождёт
+    retry_after в event loop) — поток отправки и слот TG_SEND_CONCURRENCY не держим
+    десятками секунд.
+
+    Иначе (синхронные вызовы, рассылки) на 429 ждём parameters.retry_after прямо тут
+    и повторяем (до SEND_MAX_RETRIES раз); если не помогло — возвращаем последний 429.
+    """
+    r = None
+    for _ in range(SEND_MAX_RETRIES + 1):
+        _LIMITER.wait(chat_id, chat_reserved=paced)
+        for f in (kwargs.get("files") or {}).values():
+            f.seek(0)
+        r = post("tg", f"https://api.telegram.org/bot{TG_TOKEN}/{method}", **kwargs)
+        if r.status_code != 429:
+            return r
+        # следующие отправки в чат (в т.ч. reserve_chat из очереди) тоже дождутся retry_after
+        _LIMITER.pause(_retry_after(r), chat_id)
+        if paced:
+            return r
+    logger.warning("telegram %s to %s: still 429 after %d retries", method, chat_id, SEND_MAX_RETRIES)
+    return r
+
+
+def _result(r) -> dict | None:
+    """result из ответа Bot API, если ok=true, иначе None."""
+    try:
+        data = r.json()
+    except ValueError:
+        return None
+    if not data.get("ok"):
+        return None
+    return data.get("result") or {}
+
+
+def _bad_file_id(r) -> bool:
+    """Telegram отверг сам file_id (а не сеть, лимит, блокировка бота и т.п.)."""
+    if r.status_code != 400:
+        return False
+    try:
+        desc = str(r.json().get("description", "")).lower()
+    except ValueError:
+        return False
+    return "wrong file identifier" in desc or "file reference" in desc
+
+
+def _send_photo(chat_id: int, action: OutPhoto, paced: bool = False):
+    """
+    Сначала пробуем file_id из кеша (маленький JSON-запрос, без загрузки картинки).
+    Если Telegram отверг именно file_id — забываем и загружаем файл заново,
+    а file_id из ответа сохраняем на следующий раз. Другие ошибки (429, 403, 5xx)
+    повторная загрузка не исправит, а после 5xx фото могло и дойти — не дублируем.
+    """
+    cached = _PHOTO_CACHE.get(action.path)
+    if cached:
+        r = _tg_send(
+            "sendPhoto",
+            chat_id,
+            paced,
+            json={"chat_id": chat_id, "photo": cached, "caption": action.caption or ""},
+            timeout=10,
+        )
+        if not _bad_file_id(r):
+            return r
+        _PHOTO_CACHE.drop(action.path)
+
+    with open(action.path, "rb") as f:
+        r = _tg_send(
+            "sendPhoto",
+            chat_id,
+            paced,
+            data={"chat_id": chat_id, "caption": action.caption or ""},
+            files={"photo": f},
+            timeout=30,
+        )
+
+    result = _result(r)
+    sizes = (result or {}).get("photo") or []
+    if sizes:
+        # последний PhotoSize — самый большой (оригинал)
+        _PHOTO_CACHE.put(action.path, sizes[-1]["file_id"])
+    return r
+
+
+def send_typing_tg(chat_id: int) -> None:
+    post(
+        "tg",
         f"https://api.telegram.org/bot{TG_TOKEN}/sendChatAction",
         json={"chat_id": chat_id, "action": "typing"},
         timeout=10,
     )
-    _typing_delay()
 
-    for action in actions:
+
+def deliver_actions_tg(chat_id: int, actions, paced: bool = False) -> None:
+    """
+    Только отправка сообщений, без "печатает..." и паузы.
+    429 (при paced — сразу, иначе после SEND_MAX_RETRIES повторов) — RateLimited с неотправленным остатком.
+    """
+    actions = list(actions)
+    for i, action in enumerate(actions):
         if isinstance(action, OutPhoto):
-            with open(action.path, "rb") as f:
-                requests.post(
-                    f"https://api.telegram.org/bot{TG_TOKEN}/sendPhoto",
-                    data={"chat_id": chat_id, "caption": action.caption or ""},
-                    files={"photo": f},
-                    timeout=30,
-                )
+            r = _send_photo(chat_id, action, paced)
         else:  # OutText
-            requests.post(
-                f"https://api.telegram.org/bot{TG_TOKEN}/sendMessage",
+            r = _tg_send(
+                "sendMessage",
+                chat_id,
+                paced,
                 json={"chat_id": chat_id, "text": action.text},
                 timeout=10,
             )
+        if r is not None and r.status_code == 429:
+            raise RateLimited(chat_id, actions[i:], _retry_after(r))
+
+
+def send_text_tg(chat_id: int, text: str) -> bool:
+    """Одно текстовое сообщение без "печатает..."; True, если Telegram принял (для рассылок)."""
+    r = _tg_send("sendMessage", chat_id, json={"chat_id": chat_id, "text": text}, timeout=10)
+    return _result(r) is not None
+
+
+def send_actions_tg(chat_id: int, actions):
+    """Синхронный вариант (вне event loop): пауза "печатает" блокирует поток."""
+    if not actions:
+        return
+
+    # typing один раз
+    send_typing_tg(chat_id)
+    _typing_delay()
+
+    try:
+        deliver_actions_tg(chat_id, actions)
+    except RateLimited as e:
+        # вне event loop очереди нет — вернуть некуда
+        logger.error("telegram %s: %d message(s) dropped after repeated 429", chat_id, len(e.actions))
 
@@ -1,19 +1,45 @@
 import time
 import random
-import requests
 
+from adapters.http_client import post
+from adapters.rate_limit import RateLimiter
 from core.actions import OutText, OutPhoto
-from settings import VK_TOKEN, TYPING_DELAY_MIN, TYPING_DELAY_MAX
+from core.media_cache import MediaCache
+from settings import VK_TOKEN, TYPING_DELAY_MIN, TYPING_DELAY_MAX, VK_RATE_GLOBAL, SEND_MAX_RETRIES
 
 VK_API_VERSION = "5.199"
 
+# VK: ~20 запросов в секунду на токен сообщества (все методы вместе)
+_LIMITER = RateLimiter(VK_RATE_GLOBAL, VK_RATE_GLOBAL)
 
-def _typing_delay() -> None:
+# error 6 — "Too many requests per second": можно подождать и повторить
+_VK_TOO_MANY_REQUESTS = 6
+# ошибки messages.send, означающие, что сохранённый attachment больше не годится
+# (100 — неверный параметр: фото удалено; 15 — нет доступа к фото)
+_VK_BAD_ATTACHMENT = {100, 15}
+
+# хеш картинки -> готовая строка attachment (чтобы не загружать одну и ту же карту каждый раз)
+_PHOTO_CACHE = MediaCache("vk_photo_cache")
+
+
+class VkApiError(RuntimeError):
+    """VK вернул error; code — error_code из ответа."""
+
+    def __init__(self, method: str, err: dict):
+        super().__init__(f"VK API error in {method}: {err}")
+        self.code = err.get("error_code")
+
+
+def typing_delay_seconds() -> float:
     """
     Небольшая пауза, чтобы бот выглядел "живым" (как будто печатает).
     Время берётся из settings: TYPING_DELAY_MIN / TYPING_DELAY_MAX
     """
-    time.sleep(random.uniform(TYPING_DELAY_MIN, TYPING_DELAY_MAX))
+    return random.uniform(TYPING_DELAY_MIN, TYPING_DELAY_MAX)
+
+
+def _typing_delay() -> None:
+    time.sleep(typing_delay_seconds())
 
 
 def _vk_call(method: str, params: dict, timeout: int = 20) -> dict:
@@ -22,18 +48,26 @@ def _vk_call(method: str, params: dict, timeout: int = 20) -> dict:
     - method: например "messages.send"
     - params: параметры метода
     Возвращает поле response, либо бросает исключение, если VK вернул error.
+    Лимит запросов соблюдается заранее; на error 6 ждём и повторяем.
     """
     params = dict(params)
     params["access_token"] = VK_TOKEN
     params["v"] = VK_API_VERSION
 
-    r = requests.post(f"https://api.vk.com/method/{method}", data=params, timeout=timeout)
-    data = r.json()
+    for attempt in range(SEND_MAX_RETRIES + 1):
+        _LIMITER.wait()
+        r = post("vk", f"https://api.vk.com/method/{method}", data=params, timeout=timeout)
+        data = r.json()
+
+        err = data.get("error")
+        if not err:
+            return data["response"]
 
-    if "error" in data:
-        raise RuntimeError(f"VK API error in {method}: {data['error']}")
+        if err.get("error_code") == _VK_TOO_MANY_REQUESTS and attempt < SEND_MAX_RETRIES:
+            _LIMITER.pause(1.0)
+            continue
 
-    return data["response"]
+        raise VkApiError(method, err)
 
 
 def _vk_upload_message_photo(peer_id: int, file_path: str) -> str:
@@ -47,7 +81,7 @@ def _vk_upload_message_photo(peer_id: int, file_path: str) -> str:
 
     # 2) Загружаем файл на upload URL
     with open(file_path, "rb") as f:
-        up_resp = requests.post(upload_url, files={"photo": f}, timeout=30)
+        up_resp = post("vk", upload_url, files={"photo": f}, timeout=30)
         up = up_resp.json()
 
     # Проверка, что VK вернул нужные поля
@@ -71,6 +105,36 @@ def _vk_upload_message_photo(peer_id: int, file_path: str) -> str:
     return attachment
 
 
+def _send_photo(peer_id: int, rid: int, action: OutPhoto) -> None:
+    """
+    Отправка фото с кешем вложений:
+    - если эту картинку уже загружали — один messages.send с готовым attachment;
+    - если VK отверг сохранённый attachment (фото удалено, нет доступа) — забываем его
+      и загружаем заново; другие ошибки (сеть, error 6 после повторов) пробрасываем —
+      повторная загрузка их не исправит;
+    - новый attachment сохраняем в кеш.
+    """
+    params = {
+        "peer_id": int(peer_id),
+        "random_id": rid,
+        "message": action.caption or "",
+    }
+
+    cached = _PHOTO_CACHE.get(action.path)
+    if cached:
+        try:
+            _vk_call("messages.send", {**params, "attachment": cached})
+            return
+        except VkApiError as e:
+            if e.code not in _VK_BAD_ATTACHMENT:
+                raise
+            _PHOTO_CACHE.drop(action.path)
+
+    attachment = _vk_upload_message_photo(int(peer_id), action.path)
+    _PHOTO_CACHE.put(action.path, attachment)
+    _vk_call("messages.send", {**params, "attachment": attachment})
+
+
 def _make_random_id(seed: int, idx: int) -> int:
     """
     Главная защита от дублей в VK.
@@ -92,6 +156,21 @@ def _make_random_id(seed: int, idx: int) -> int:
     return random.randint(1, 2_000_000_000)
 
 
+def send_text_vk(peer_id: int, text: str, random_id: int) -> bool:
+    """
+    Одно текстовое сообщение без "печатает..."; True, если VK принял (для рассылок).
+    random_id передаётся снаружи, чтобы повтор после таймаута не создал дубль.
+    """
+    try:
+        _vk_call(
+            "messages.send",
+            {"peer_id": int(peer_id), "random_id": int(random_id), "message": text},
+        )
+        return True
+    except Exception:
+        return False
+
+
 def send_actions_vk(peer_id: int, actions, seed: int = 0) -> None:
     """
     Отправляет actions в VK.
@@ -112,8 +191,24 @@ def send_actions_vk(peer_id: int, actions, seed: int = 0) -> None:
         return
 
     # 1) "печатает..." (не критично, если сломается)
+    send_typing_vk(peer_id)
+
+    # 2) задержка печати (не критично)
+    try:
+        _typing_delay()
+    except Exception:
+        pass
+
+    # 3) отправка действий
+    deliver_actions_vk(peer_id, actions, seed)
+
+
+def send_typing_vk(peer_id: int) -> None:
+    """Статус "печатает..." (не критично, если сломается)."""
     try:
-        requests.post(
+        _LIMITER.wait()
+        post(
+            "vk",
             "https://api.vk.com/method/messages.setActivity",
             data={
                 "access_token": VK_TOKEN,
@@ -126,29 +221,16 @@ def send_actions_vk(peer_id: int, actions, seed: int = 0) -> None:
     except Exception:
         pass
 
-    # 2) задержка печати (не критично)
-    try:
-        _typing_delay()
-    except Exception:
-        pass
 
-    # 3) отправка действий
+def deliver_actions_vk(peer_id: int, actions, seed: int = 0) -> None:
+    """Только отправка сообщений, без "печатает..." и паузы (про seed — см. send_actions_vk)."""
     for idx, action in enumerate(actions):
         rid = _make_random_id(seed, idx)
 
         try:
             # --- отправка фото ---
             if isinstance(action, OutPhoto):
-                attachment = _vk_upload_message_photo(int(peer_id), action.path)
-                _vk_call(
-                    "messages.send",
-                    {
-                        "peer_id": int(peer_id),
-                        "random_id": rid,
-                        "message": action.caption or "",
-                        "attachment": attachment,
-                    },
-                )
+                _send_photo(int(peer_id), rid, action)
                 continue
 
             # --- отправка текста ---
@@ -1,18 +1,86 @@
 import asyncio
+import logging
 import time
+from collections import deque
 from fastapi import FastAPI, Request, Response
 
 from core.engine import build_reply_actions
-from adapters.vk_sender import send_actions_vk
-from adapters.tg_sender import send_actions_tg
+from adapters.http_client import http_stats
 
 from core.idle_notifier import touch, init_known_chats
-from settings import VK_CONFIRMATION, VK_SECRET, TG_WEBHOOK_SECRET
+from settings import VK_CONFIRMATION, VK_SECRET, TG_WEBHOOK_SECRET, PROCESS_CONCURRENCY, PROCESS_QUEUE_MAX
 
-from core.chat_store_pg import init_who_today_tables, touch_chat_user
+from core.activity_buffer import buffer_chat_user, start_flusher, stop_flusher
+from core.chat_store_pg import run_migrations, run_db, close_pool
+from core.executor import run_blocking, shutdown_executor
+from core import roster
+from modules.who_today.handler import today_msk
+from core.delivery import submit, start_delivery, stop_delivery, delivery_stats
+from modules.admin_commands.broadcast import resume_broadcasts, stop_broadcasts
+from modules.horoscope.handler import start_prefetch, stop_prefetch
+from modules.lunar_day.lunar_table import warm_up as warm_up_lunar
 
 
 app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# ---- Обработка сообщений в фоне ----
+# Webhook отвечает сразу, а ответ собирается и ставится в очередь отправки
+# отдельной задачей: медленный модуль (сеть, БД) не держит запрос VK/TG
+# и не вызывает их повторную доставку.
+#
+# Сообщения одного чата обрабатываются строго по очереди: ответ ставится в очередь
+# отправки (core/delivery, FIFO по чату) в том же порядке, в каком пришли сообщения,
+# и быстрый ответ не обгоняет медленный (таро, гороскоп). Разные чаты — параллельно,
+# но не больше PROCESS_CONCURRENCY сразу; принятых и ещё не обработанных сообщений
+# не больше PROCESS_QUEUE_MAX, дальше webhook ждёт место (как submit() в delivery).
+_BG_TASKS: set[asyncio.Task] = set()
+
+# (platform, chat_id) -> [(text, user_id), ...]; ключ есть, пока чат обрабатывается
+_inbox: dict[tuple[str, int], deque[tuple[str, int]]] = {}
+_inbox_slots = asyncio.Semaphore(PROCESS_QUEUE_MAX)
+_processing = asyncio.Semaphore(PROCESS_CONCURRENCY)
+
+
+async def _process_message(platform: str, text: str, user_id: int, chat_id: int):
+    try:
+        actions = await build_reply_actions(text, user_id, chat_id, source=platform)
+        if actions:
+            await submit(platform, chat_id, actions)
+    except Exception:
+        logger.exception("message processing failed (%s, chat %s)", platform, chat_id)
+
+
+async def _drain_chat(platform: str, chat_id: int):
+    key = (platform, chat_id)
+    q = _inbox[key]
+    try:
+        while q:
+            text, user_id = q.popleft()
+            try:
+                async with _processing:
+                    await _process_message(platform, text, user_id, chat_id)
+            finally:
+                _inbox_slots.release()
+    finally:
+        _inbox.pop(key, None)
+
+
+async def _spawn_processing(platform: str, text: str, user_id: int, chat_id: int):
+    await _inbox_slots.acquire()
+    key = (platform, int(chat_id))
+    q = _inbox.get(key)
+    if q is not None:
+        # чат уже обрабатывается — встанет в хвост
+        q.append((text, user_id))
+        return
+
+    _inbox[key] = deque([(text, user_id)])
+    task = asyncio.get_running_loop().create_task(_drain_chat(platform, int(chat_id)))
+    # держим ссылку, иначе задачу может собрать GC до завершения
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+
 
 # ---- Анти-дубли ----
 # Храним обработанные id короткое время (10 минут)
@@ -52,11 +120,48 @@ def _seen_tg(update_id: int) -> bool:
 
 @app.on_event("startup")
 async def startup_event():
+    # Схема БД: все таблицы и индексы (один раз, под advisory lock — безопасно для нескольких воркеров)
+    await run_db(run_migrations)
+
     # Загружаем сохранённые чаты (Render Postgres), чтобы рассылка помнила их после деплоя
     await init_known_chats()
 
-    # Таблицы для модуля "Кто сегодня"
-    init_who_today_tables()
+    # Участники чатов и сегодняшние титулы для "Кто сегодня" — в память
+    await run_db(roster.warm_from_db, today_msk())
+    roster.start_refresh(today_msk)
+
+    # Фоновый сброс буфера активности (known_chats / chat_users)
+    start_flusher()
+
+    # Воркеры очереди исходящих ответов
+    start_delivery()
+
+    # Незавершённые админ-рассылки (например, прерванные редеплоем)
+    await resume_broadcasts()
+
+    # Гороскопы: прогрев кеша и ежедневная предзагрузка после полуночи МСК
+    start_prefetch()
+
+    # Эфемериды Луны: поднимаем с диска или считаем в фоне, чтобы первый "луна" не ждал
+    task = asyncio.get_running_loop().create_task(run_blocking(warm_up_lunar))
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # сначала дописываем буфер, потом закрываем пул
+    # даём фоновым обработкам сообщений поставить ответы в очередь
+    if _BG_TASKS:
+        await asyncio.wait(list(_BG_TASKS), timeout=10)
+
+    await stop_prefetch()
+    await roster.stop_refresh()
+    await stop_broadcasts()
+    await stop_delivery()
+    await stop_flusher()
+    shutdown_executor()
+    close_pool()
 
 
 @app.get("/")
@@ -64,6 +169,11 @@ def health():
     return {"ok": True}
 
 
+@app.get("/stats")
+def stats():
+    return {"http": http_stats(), "delivery": delivery_stats()}
+
+
 @app.post("/vk")
 async def vk_callback(req: Request):
     data = await req.json()
@@ -101,16 +211,14 @@ async def vk_callback(req: Request):
 
     # запоминаем пользователя в этом чате для "Кто сегодня"
     if from_id > 0:
-        touch_chat_user("vk", peer_id, from_id, None)
+        buffer_chat_user("vk", peer_id, from_id, None)
+        roster.observe("vk", peer_id, from_id, None)
 
     if from_id <= 0:
         return Response("ok")
 
-    actions = await build_reply_actions(text, from_id, peer_id, source="vk")
-
-    # отправляем в фоне, чтобы быстро ответить webhook (и не получить ретрай)
-    if actions:
-        asyncio.create_task(asyncio.to_thread(send_actions_vk, peer_id, actions))
+    # отвечаем webhook сразу (иначе VK ретраит), ответ соберётся в фоне
+    await _spawn_processing("vk", text, from_id, peer_id)
 
     return Response("ok")
 
@@ -151,12 +259,10 @@ async def tg_webhook(secret: str, req: Request):
         tg_name = message["from"].get("username")
 
     # запоминаем пользователя в этом чате
-    touch_chat_user("tg", chat_id, user_id, tg_name)
-
-    actions = await build_reply_actions(text, user_id, chat_id, source="tg")
+    buffer_chat_user("tg", chat_id, user_id, tg_name)
+    roster.observe("tg", chat_id, user_id, tg_name)
 
-    # TG обычно не ретраит так агрессивно, но на всякий случай можно тоже в фоне
-    if actions:
-        asyncio.create_task(asyncio.to_thread(send_actions_tg, chat_id, actions))
+    # TG тоже ретраит долгие webhook'и — отвечаем сразу, ответ соберётся в фоне
+    await _spawn_processing("tg", text, user_id, chat_id)
 
     return {"ok": True}
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from core.chat_store_pg import run_db, upsert_chats_batch, touch_chat_users_batch, log_angel_times_batch
+from settings import ACTIVITY_ANGEL_BACKLOG_MAX, ACTIVITY_FLUSH_MS, ACTIVITY_FLUSH_ROWS
+
+logger = logging.getLogger(__name__)
+
+# Буфер "кто и где писал". Повторные сообщения из того же чата/от того же
+# пользователя просто перезаписывают ключ, поэтому в БД уходит одна строка
+# на чат (пользователя) за период, а не одна на каждое сообщение.
+# Строки пачки уходят в БД отсортированными по ключу: несколько воркеров делают
+# multi-row ON CONFLICT по одним и тем же ключам, и одинаковый порядок блокировок
+# не даёт им взаимно заблокироваться.
+
+# (platform, chat_id) -> ts
+_chats: Dict[Tuple[str, int], float] = {}
+# (platform, chat_id, user_id) -> (display_name, ts)
+_users: Dict[Tuple[str, int, int], Tuple[str | None, float]] = {}
+
+# Попадания в ангельское время — каждое событие отдельная строка, поэтому список.
+# Пишутся из потоков модулей, так что под локом.
+# [(platform, chat_id, user_id, time_value, ts), ...]
+_angel_hits: List[Tuple[str, int, int, str, float]] = []
+_angel_lock = threading.Lock()
+
+_wakeup: asyncio.Event | None = None
+_task: asyncio.Task | None = None
+_stopping = False
+
+
+def _pending() -> int:
+    return len(_chats) + len(_users) + len(_angel_hits)
+
+
+def _maybe_wakeup() -> None:
+    if _wakeup is not None and _pending() >= ACTIVITY_FLUSH_ROWS:
+        _wakeup.set()
+
+
+def buffer_chat(platform: str, chat_id: int) -> None:
+    """Отметить активность чата (уйдёт в known_chats при следующем сбросе)."""
+    _chats[(platform, int(chat_id))] = time.time()
+    _maybe_wakeup()
+
+
+def buffer_chat_user(platform: str, chat_id: int, user_id: int, display_name: str | None = None) -> None:
+    """Отметить, что пользователь писал в чате (уйдёт в chat_users при следующем сбросе)."""
+    key = (platform, int(chat_id), int(user_id))
+    if display_name is None:
+        # имя могло прийти раньше в этом же окне — не теряем его
+        prev = _users.get(key)
+        if prev:
+            display_name = prev[0]
+    _users[key] = (display_name, time.time())
+    _maybe_wakeup()
+
+
+def buffer_angel_hit(platform: str, chat_id: int, user_id: int, time_value: str) -> None:
+    """
+    Засчитать попадание в ангельское время (уйдёт в angel_time_stats при следующем сбросе).
+    Можно вызывать из любого потока; сброс — по таймеру.
+    """
+    with _angel_lock:
+        _angel_hits.append((platform, int(chat_id), int(user_id), time_value, time.time()))
+
+
+async def flush() -> None:
+    """Сбросить накопленное в Postgres (по одному multi-row INSERT на таблицу)."""
+    global _chats, _users, _angel_hits
+    if not _chats and not _users and not _angel_hits:
+        return
+
+    chats, _chats = _chats, {}
+    users, _users = _users, {}
+    with _angel_lock:
+        hits, _angel_hits = _angel_hits, []
+
+    try:
+        if chats:
+            await run_db(upsert_chats_batch, [(p, c, ts) for (p, c), ts in sorted(chats.items())])
+    except Exception:
+        logger.exception("activity flush (known_chats) failed, will retry")
+        for k, ts in chats.items():
+            _chats[k] = max(ts, _chats.get(k, 0.0))
+
+    try:
+        if users:
+            await run_db(
+                touch_chat_users_batch,
+                [(p, c, u, name, ts) for (p, c, u), (name, ts) in sorted(users.items())],
+            )
+    except Exception:
+        logger.exception("activity flush (chat_users) failed, will retry")
+        for k, (name, ts) in users.items():
+            newer = _users.get(k)
+            if newer is None:
+                _users[k] = (name, ts)
+            elif newer[0] is None and name is not None:
+                _users[k] = (name, newer[1])
+
+    try:
+        if hits:
+            await run_db(log_angel_times_batch, hits)
+    except Exception:
+        logger.exception("activity flush (angel_time_stats) failed, will retry")
+        with _angel_lock:
+            _angel_hits[:0] = hits
+            extra = len(_angel_hits) - ACTIVITY_ANGEL_BACKLOG_MAX
+            if extra > 0:
+                # БД лежит долго — не копим бесконечно, теряем самые старые
+                del _angel_hits[:extra]
+        if extra > 0:
+            logger.warning("angel hit backlog is full, dropped %d oldest hits", extra)
+
+
+async def _flush_loop() -> None:
+    interval = max(ACTIVITY_FLUSH_MS, 1) / 1000.0
+    while not _stopping:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        await flush()
+
+
+def start_flusher() -> None:
+    """Запускается на старте приложения (нужен работающий event loop)."""
+    global _wakeup, _task, _stopping
+    if _task is not None:
+        return
+    _stopping = False
+    _wakeup = asyncio.Event()
+    _task = asyncio.get_running_loop().create_task(_flush_loop())
+
+
+async def stop_flusher() -> None:
+    """
+    Останавливаем фоновый сброс и дописываем всё, что осталось в буфере.
+    Цикл не отменяем: если он посреди flush(), пачка уже вынута из буфера
+    и отмена её бы потеряла — поэтому просим его выйти и ждём.
+    """
+    global _task, _stopping
+    if _task is not None:
+        _stopping = True
+        _wakeup.set()
+        try:
+            await _task
+        except Exception:
+            logger.exception("activity flusher failed")
+        _task = None
+    await flush()
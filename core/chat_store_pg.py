@@ -1,11 +1,21 @@
+import asyncio
+import functools
 import os
-from typing import Dict, Tuple
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Mapping, Tuple
 
 import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 from datetime import date
 
+from settings import DB_POOL_MIN, DB_POOL_MAX, DB_HEALTHCHECK_IDLE_SEC
 
-# ---------------- базовое подключение ----------------
+
+# ---------------- базовое подключение (пул) ----------------
 
 def _dsn() -> str:
     dsn = os.getenv("DATABASE_URL", "").strip()
@@ -14,53 +24,301 @@ def _dsn() -> str:
     return dsn
 
 
-def _get_conn():
-    return psycopg2.connect(_dsn())
+_pool: ThreadedConnectionPool | None = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool не ждёт свободное соединение, а сразу падает с PoolError,
+# поэтому ограничиваем число одновременных пользователей пула семафором.
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+# id(conn) -> когда соединение последний раз вернулось в пул
+_last_used: dict[int, float] = {}
+
+_db_executor: ThreadPoolExecutor | None = None
+
 
+def _get_pool() -> ThreadedConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, _dsn())
+    return _pool
 
-# ---------------- Кто сегодня (таблицы + операции) ----------------
 
-def init_who_today_tables():
+def _is_alive(conn) -> bool:
     """
-    Создаёт таблицы для модуля "Кто сегодня":
-    1) chat_users — пользователи, которые писали в этом чате
-    2) who_today_assignments — кому уже выдали титул в конкретный день
+    Проверка соединения перед выдачей.
+    Пингуем только если соединение долго лежало без дела — иначе лишний round-trip.
     """
-    conn = _get_conn()
+    if conn.closed:
+        return False
+
+    idle = time.monotonic() - _last_used.get(id(conn), 0.0)
+    if idle < DB_HEALTHCHECK_IDLE_SEC:
+        return True
+
     try:
         with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS chat_users (
-                    platform TEXT NOT NULL,
-                    chat_id BIGINT NOT NULL,
-                    user_id BIGINT NOT NULL,
-                    display_name TEXT,
-                    last_seen TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    PRIMARY KEY (platform, chat_id, user_id)
-                );
-            """)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS who_today_assignments (
-                    platform TEXT NOT NULL,
-                    chat_id BIGINT NOT NULL,
-                    day DATE NOT NULL,
-                    user_id BIGINT NOT NULL,
-                    title TEXT NOT NULL,
-                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    PRIMARY KEY (platform, chat_id, day, user_id)
-                );
-            """)
-        conn.commit()
+            cur.execute("SELECT 1;")
+        conn.rollback()
+        return True
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        return False
+
+
+def _checkout(pool: ThreadedConnectionPool):
+    # протухшие соединения (рестарт БД, обрыв сети) выкидываем и берём следующее
+    for _ in range(DB_POOL_MAX):
+        conn = pool.getconn()
+        if _is_alive(conn):
+            return conn
+        _last_used.pop(id(conn), None)
+        pool.putconn(conn, close=True)
+    return pool.getconn()
+
+
+@contextmanager
+def _conn():
+    """
+    Соединение из пула на время одной операции.
+    На выходе: commit (или rollback при ошибке) и возврат соединения в пул.
+    Сломанные соединения закрываются, а не возвращаются.
+    """
+    pool = _get_pool()
+    _pool_slots.acquire()
+    conn = None
+    broken = False
+    try:
+        conn = _checkout(pool)
+        try:
+            yield conn
+            conn.commit()
+        except Exception as e:
+            broken = bool(conn.closed) or isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not broken:
+                try:
+                    conn.rollback()
+                except Exception:
+                    broken = True
+            raise
     finally:
-        conn.close()
+        if conn is not None:
+            if broken:
+                _last_used.pop(id(conn), None)
+            else:
+                _last_used[id(conn)] = time.monotonic()
+            pool.putconn(conn, close=broken)
+        _pool_slots.release()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    if _db_executor is None:
+        with _pool_lock:
+            if _db_executor is None:
+                # потоков столько же, сколько соединений: больше всё равно ждали бы пул
+                _db_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX, thread_name_prefix="db")
+    return _db_executor
+
+
+async def run_db(fn, *args, **kwargs):
+    """
+    Async-вход для любой функции этого модуля:
+        await run_db(touch_chat_user, "tg", chat_id, user_id, name)
+    Работает в отдельном пуле потоков размером с пул соединений,
+    поэтому не занимает дефолтный executor и не плодит потоки.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(fn, *args, **kwargs))
+
+
+def close_pool() -> None:
+    """Закрываем все соединения (вызывается при остановке приложения)."""
+    global _pool, _db_executor
+    with _pool_lock:
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=True)
+            _db_executor = None
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+        _last_used.clear()
+
+
+# ---------------- миграции схемы ----------------
+# Схема создаётся один раз на старте приложения (run_migrations), а не в обработчиках.
+# Каждая миграция: (версия, описание, [SQL, ...]). Уже выкаченные миграции не меняем —
+# для изменений схемы добавляем новую с большим номером.
+# Миграция 1 — таблицы, которые раньше создавались init_*-функциями; там везде
+# IF NOT EXISTS, так что на существующей базе она просто отмечается применённой.
+
+MIGRATIONS: list[tuple[int, str, list[str]]] = [
+    (1, "base tables", [
+        """
+        CREATE TABLE IF NOT EXISTS known_chats (
+            platform TEXT NOT NULL,
+            chat_id  BIGINT NOT NULL,
+            last_seen TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (platform, chat_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS chat_users (
+            platform TEXT NOT NULL,
+            chat_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            display_name TEXT,
+            last_seen TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (platform, chat_id, user_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS who_today_assignments (
+            platform TEXT NOT NULL,
+            chat_id BIGINT NOT NULL,
+            day DATE NOT NULL,
+            user_id BIGINT NOT NULL,
+            title TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (platform, chat_id, day, user_id)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS angel_time_stats (
+            id SERIAL PRIMARY KEY,
+            platform TEXT NOT NULL,
+            chat_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            time_value TEXT NOT NULL,
+            seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS tarot_daily (
+            source  TEXT NOT NULL,
+            user_id BIGINT NOT NULL,
+            day     DATE NOT NULL,
+            card    TEXT NOT NULL,
+            PRIMARY KEY (source, user_id, day)
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS broadcast_jobs (
+            id BIGSERIAL PRIMARY KEY,
+            text TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'running',
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            finished_at TIMESTAMPTZ
+        );
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS broadcast_targets (
+            job_id BIGINT NOT NULL REFERENCES broadcast_jobs(id) ON DELETE CASCADE,
+            platform TEXT NOT NULL,
+            chat_id BIGINT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (job_id, platform, chat_id)
+        );
+        """,
+    ]),
+    (2, "angel_time: covering index and per-user counters", [
+        """
+        CREATE INDEX IF NOT EXISTS angel_time_stats_user_idx
+        ON angel_time_stats (platform, chat_id, user_id, time_value);
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS angel_time_user_stats (
+            platform TEXT NOT NULL,
+            chat_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            time_value TEXT NOT NULL,
+            hits BIGINT NOT NULL,
+            PRIMARY KEY (platform, chat_id, user_id, time_value)
+        );
+        """,
+        # счётчики из уже накопленного журнала (журнал и счётчики пишутся в одной транзакции,
+        # поэтому существующие строки счётчиков уже согласованы с журналом)
+        """
+        INSERT INTO angel_time_user_stats (platform, chat_id, user_id, time_value, hits)
+        SELECT platform, chat_id, user_id, time_value, COUNT(*)
+        FROM angel_time_stats
+        GROUP BY platform, chat_id, user_id, time_value
+        ON CONFLICT DO NOTHING;
+        """,
+    ]),
+    (3, "who_today: indexes for candidate selection and title stats", [
+        # кандидаты "кто сегодня": участники чата по свежести, без сортировки всего чата
+        """
+        CREATE INDEX IF NOT EXISTS chat_users_recent_idx
+        ON chat_users (platform, chat_id, last_seen DESC) INCLUDE (user_id, display_name);
+        """,
+        # топ титулов чата за всё время
+        """
+        CREATE INDEX IF NOT EXISTS who_today_assignments_title_idx
+        ON who_today_assignments (platform, chat_id, title);
+        """,
+    ]),
+    (4, "broadcasts: owning worker and heartbeat", [
+        # рассылку ведёт ровно один воркер; если он пропал (heartbeat устарел) — её забирает другой
+        """
+        ALTER TABLE broadcast_jobs
+            ADD COLUMN IF NOT EXISTS owner TEXT,
+            ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+        """,
+    ]),
+    (5, "who_today: indexes for periodic roster refresh", [
+        # core/roster раз в ROSTER_REFRESH_SEC читает изменившееся с последнего раза
+        "CREATE INDEX IF NOT EXISTS chat_users_last_seen_idx ON chat_users (last_seen);",
+        "CREATE INDEX IF NOT EXISTS who_today_assignments_created_idx ON who_today_assignments (created_at);",
+    ]),
+]
+
+# ключ pg_advisory_xact_lock: несколько gunicorn-воркеров стартуют одновременно,
+# миграции выполняет первый, остальные ждут и видят, что всё уже применено
+_MIGRATIONS_LOCK_ID = 7_345_001
+
+
+def run_migrations() -> list[int]:
+    """
+    Применить недостающие миграции (одна транзакция под advisory lock).
+    Возвращает версии, применённые в этот раз.
+    """
+    applied: list[int] = []
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s);", (_MIGRATIONS_LOCK_ID,))
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """
+            )
+            cur.execute("SELECT version FROM schema_migrations;")
+            done = {int(v) for (v,) in cur.fetchall()}
+
+            for version, name, statements in MIGRATIONS:
+                if version in done:
+                    continue
+                for sql in statements:
+                    cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s);",
+                    (version, name),
+                )
+                applied.append(version)
+    return applied
+
 
+# ---------------- Кто сегодня ----------------
 
 def touch_chat_user(platform: str, chat_id: int, user_id: int, display_name: str | None = None):
     """
     Запоминаем, что пользователь писал в этом чате.
     """
-    conn = _get_conn()
-    try:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO chat_users (platform, chat_id, user_id, display_name, last_seen)
@@ -70,80 +328,165 @@ def touch_chat_user(platform: str, chat_id: int, user_id: int, display_name: str
                     display_name = COALESCE(EXCLUDED.display_name, chat_users.display_name),
                     last_seen = NOW();
             """, (platform, int(chat_id), int(user_id), display_name))
-        conn.commit()
-    finally:
-        conn.close()
 
 
-def get_available_users_for_today(platform: str, chat_id: int, day: date, limit: int = 200) -> list[tuple[int, str | None]]:
+def touch_chat_users_batch(rows: list[tuple[str, int, int, str | None, float]]) -> None:
     """
-    Возвращает пользователей этого чата, которые ещё НЕ получали титул сегодня.
+    То же, что touch_chat_user, но пачкой одним INSERT ... ON CONFLICT.
+    rows: [(platform, chat_id, user_id, display_name, ts), ...], ts — unix time.
+    Ключи (platform, chat_id, user_id) в пачке должны быть уникальны.
     """
-    conn = _get_conn()
-    try:
+    if not rows:
+        return
+    with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("""
-                SELECT u.user_id, u.display_name
-                FROM chat_users u
-                WHERE u.platform = %s AND u.chat_id = %s
-                  AND NOT EXISTS (
-                      SELECT 1
-                      FROM who_today_assignments a
-                      WHERE a.platform = u.platform
-                        AND a.chat_id = u.chat_id
-                        AND a.day = %s
-                        AND a.user_id = u.user_id
-                  )
-                ORDER BY u.last_seen DESC
-                LIMIT %s;
-            """, (platform, int(chat_id), day, int(limit)))
-            rows = cur.fetchall()
-            return [(int(r[0]), r[1]) for r in rows]
-    finally:
-        conn.close()
+            execute_values(
+                cur,
+                """
+                INSERT INTO chat_users (platform, chat_id, user_id, display_name, last_seen)
+                VALUES %s
+                ON CONFLICT (platform, chat_id, user_id)
+                DO UPDATE SET
+                    display_name = COALESCE(EXCLUDED.display_name, chat_users.display_name),
+                    last_seen = GREATEST(chat_users.last_seen, EXCLUDED.last_seen);
+                """,
+                rows,
+                template="(%s, %s, %s, %s, to_timestamp(%s))",
+                page_size=len(rows),
+            )
+
+
+# Запросы вынесены в константы, чтобы core/pg_bench.py проверял планы ровно этих запросов.
+# Кандидаты: активные участники чата (диапазон по chat_users_recent_idx) без титула сегодня
+# (проверка по первичному ключу who_today_assignments). Сколько раз кто получал титул, здесь
+# не считаем — это агрегат по всей истории чата; счётчики держит core/roster.
+CANDIDATES_SQL = """
+    SELECT u.user_id, u.display_name, EXTRACT(EPOCH FROM u.last_seen)
+    FROM chat_users u
+    WHERE u.platform = %(platform)s AND u.chat_id = %(chat_id)s
+      AND u.last_seen >= to_timestamp(%(active_since)s)
+      AND NOT EXISTS (
+          SELECT 1
+          FROM who_today_assignments a
+          WHERE a.platform = u.platform
+            AND a.chat_id = u.chat_id
+            AND a.day = %(day)s
+            AND a.user_id = u.user_id
+      );
+"""
+
+TITLE_STATS_SQL = """
+    SELECT title, COUNT(*) as c
+    FROM who_today_assignments
+    WHERE platform = %s
+      AND chat_id = %s
+    GROUP BY title
+    ORDER BY c DESC, title ASC
+    LIMIT %s;
+"""
+
+
+def scan_candidates_for_today(
+    platform: str,
+    chat_id: int,
+    day: date,
+    active_since: float,
+    consume,
+    picks: Mapping[int, int] | None = None,
+):
+    """
+    Кандидаты "Кто сегодня" прямо из Postgres (если ростер в памяти не прогрет).
+    Строки (user_id, display_name, last_seen_ts, picks) идут серверным курсором пачками
+    в consume(rows) — в Python одновременно лежит только одна пачка. Возвращает результат consume.
+    picks — {user_id: сколько раз получал титул} (из core/roster), нет в словаре — 0.
+    """
+    picks = picks or {}
+    with _conn() as conn:
+        with conn.cursor(name="who_today_candidates") as cur:
+            cur.itersize = 2000
+            cur.execute(
+                CANDIDATES_SQL,
+                {"platform": platform, "chat_id": int(chat_id), "day": day, "active_since": float(active_since)},
+            )
+            return consume((int(u), n, float(ts), picks.get(int(u), 0)) for (u, n, ts) in cur)
 
 
-def assign_title_today(platform: str, chat_id: int, day: date, user_id: int, title: str):
+def assign_title_today(platform: str, chat_id: int, day: date, user_id: int, title: str) -> bool:
     """
     Фиксируем: этому пользователю в этом чате сегодня уже дали титул.
+    False — титул ему сегодня уже выдали раньше (например, другой воркер).
     """
-    conn = _get_conn()
-    try:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 INSERT INTO who_today_assignments (platform, chat_id, day, user_id, title)
                 VALUES (%s, %s, %s, %s, %s)
-                ON CONFLICT DO NOTHING;
+                ON CONFLICT DO NOTHING
+                RETURNING user_id;
             """, (platform, int(chat_id), day, int(user_id), title))
-        conn.commit()
-    finally:
-        conn.close()
+            return cur.fetchone() is not None
 
 
-def get_who_today_title_stats(platform: str, chat_id: int, limit: int = 10) -> list[tuple[str, int]]:
+def load_chat_users(since: float | None = None) -> list[tuple[str, int, int, str | None, float]]:
     """
-    Топ титулов в этом чате за всё время.
-    Возвращает: [(title, count), ...]
+    Участники всех чатов для core/roster: [(platform, chat_id, user_id, name, ts), ...].
+    since — только писавшие позже (unix time), для периодического обновления.
     """
-    conn = _get_conn()
-    try:
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            if since is None:
+                cur.execute(
+                    "SELECT platform, chat_id, user_id, display_name, EXTRACT(EPOCH FROM last_seen) FROM chat_users;"
+                )
+            else:
+                cur.execute(
+                    """
+                    SELECT platform, chat_id, user_id, display_name, EXTRACT(EPOCH FROM last_seen)
+                    FROM chat_users WHERE last_seen > to_timestamp(%s);
+                    """,
+                    (float(since),),
+                )
+            return [(str(p), int(c), int(u), n, float(ts)) for (p, c, u, n, ts) in cur.fetchall()]
+
+
+def load_pick_counts() -> list[tuple[str, int, int, int]]:
+    """Сколько раз кто получал титул: [(platform, chat_id, user_id, n), ...]."""
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT title, COUNT(*) as c
+                SELECT platform, chat_id, user_id, COUNT(*)
                 FROM who_today_assignments
-                WHERE platform = %s
-                  AND chat_id = %s
-                GROUP BY title
-                ORDER BY c DESC, title ASC
-                LIMIT %s;
+                GROUP BY platform, chat_id, user_id;
+                """
+            )
+            return [(str(p), int(c), int(u), int(n)) for (p, c, u, n) in cur.fetchall()]
+
+
+def load_assignments_since(since: float) -> list[tuple[str, int, date, int, float]]:
+    """Титулы, выданные позже since (unix time): [(platform, chat_id, day, user_id, created_ts), ...]."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT platform, chat_id, day, user_id, EXTRACT(EPOCH FROM created_at)
+                FROM who_today_assignments WHERE created_at > to_timestamp(%s);
                 """,
-                (platform, int(chat_id), int(limit)),
+                (float(since),),
             )
+            return [(str(p), int(c), d, int(u), float(ts)) for (p, c, d, u, ts) in cur.fetchall()]
+
+
+def get_who_today_title_stats(platform: str, chat_id: int, limit: int = 10) -> list[tuple[str, int]]:
+    """
+    Топ титулов в этом чате за всё время.
+    Возвращает: [(title, count), ...]
+    """
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(TITLE_STATS_SQL, (platform, int(chat_id), int(limit)))
             rows = cur.fetchall()
             return [(str(t), int(c)) for (t, c) in rows]
-    finally:
-        conn.close()
 
 
 def get_who_today_title_stats_today(
@@ -152,8 +495,7 @@ def get_who_today_title_stats_today(
     """
     Топ титулов в этом чате за конкретную дату (обычно сегодня).
     """
-    conn = _get_conn()
-    try:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -170,32 +512,13 @@ def get_who_today_title_stats_today(
             )
             rows = cur.fetchall()
             return [(str(t), int(c)) for (t, c) in rows]
-    finally:
-        conn.close()
 
 
 # ---------------- known_chats (для админ-рассылки) ----------------
 
-def init_pg() -> None:
-    """Создаём таблицу, если её ещё нет."""
-    with psycopg2.connect(_dsn()) as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS known_chats (
-                    platform TEXT NOT NULL,
-                    chat_id  BIGINT NOT NULL,
-                    last_seen TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    PRIMARY KEY (platform, chat_id)
-                );
-                """
-            )
-        conn.commit()
-
-
 def upsert_chat(platform: str, chat_id: int) -> None:
     """Запоминаем чат (или обновляем last_seen)."""
-    with psycopg2.connect(_dsn()) as conn:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
@@ -206,13 +529,35 @@ def upsert_chat(platform: str, chat_id: int) -> None:
                 """,
                 (platform, int(chat_id)),
             )
-        conn.commit()
+
+
+def upsert_chats_batch(rows: list[tuple[str, int, float]]) -> None:
+    """
+    Пачка чатов одним запросом: [(platform, chat_id, ts), ...], ts — unix time.
+    Ключи (platform, chat_id) в пачке должны быть уникальны.
+    """
+    if not rows:
+        return
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
+                """
+                INSERT INTO known_chats(platform, chat_id, last_seen)
+                VALUES %s
+                ON CONFLICT (platform, chat_id)
+                DO UPDATE SET last_seen = GREATEST(known_chats.last_seen, EXCLUDED.last_seen);
+                """,
+                rows,
+                template="(%s, %s, to_timestamp(%s))",
+                page_size=len(rows),
+            )
 
 
 def load_chats() -> Dict[Tuple[str, int], float]:
     """Загружаем список чатов из БД в формат, удобный для _last_activity."""
     out: Dict[Tuple[str, int], float] = {}
-    with psycopg2.connect(_dsn()) as conn:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute("SELECT platform, chat_id FROM known_chats;")
             for platform, chat_id in cur.fetchall():
@@ -222,68 +567,264 @@ def load_chats() -> Dict[Tuple[str, int], float]:
 
 # ---------------- Ангельское время (статистика) ----------------
 
-def init_angel_time_stats() -> None:
-    """Таблица для статистики 'ангельского времени'."""
-    with psycopg2.connect(_dsn()) as conn:
+def log_angel_times_batch(rows: list[tuple[str, int, int, str, float]]) -> None:
+    """
+    Пачка попаданий: [(platform, chat_id, user_id, time_value, ts), ...], ts — unix time.
+    В одной транзакции: строки в журнал + прибавка к счётчикам (по одному INSERT на таблицу).
+    """
+    if not rows:
+        return
+
+    counts: dict[tuple[str, int, int, str], int] = {}
+    for platform, chat_id, user_id, time_value, _ts in rows:
+        key = (platform, int(chat_id), int(user_id), time_value)
+        counts[key] = counts.get(key, 0) + 1
+
+    with _conn() as conn:
         with conn.cursor() as cur:
-            cur.execute(
+            execute_values(
+                cur,
                 """
-                CREATE TABLE IF NOT EXISTS angel_time_stats (
-                    id SERIAL PRIMARY KEY,
-                    platform TEXT NOT NULL,
-                    chat_id BIGINT NOT NULL,
-                    user_id BIGINT NOT NULL,
-                    time_value TEXT NOT NULL,
-                    seen_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
-                );
+                INSERT INTO angel_time_stats (platform, chat_id, user_id, time_value, seen_at)
+                VALUES %s;
+                """,
+                rows,
+                template="(%s, %s, %s, %s, to_timestamp(%s))",
+                page_size=len(rows),
+            )
+            execute_values(
+                cur,
                 """
+                INSERT INTO angel_time_user_stats (platform, chat_id, user_id, time_value, hits)
+                VALUES %s
+                ON CONFLICT (platform, chat_id, user_id, time_value)
+                DO UPDATE SET hits = angel_time_user_stats.hits + EXCLUDED.hits;
+                """,
+                [(*key, n) for key, n in sorted(counts.items())],
+                page_size=len(counts),
             )
-        conn.commit()
 
 
 def log_angel_time(platform: str, chat_id: int, user_id: int, time_value: str) -> None:
     """Записать, что пользователь увидел время."""
-    with psycopg2.connect(_dsn()) as conn:
+    log_angel_times_batch([(platform, int(chat_id), int(user_id), time_value, time.time())])
+
+
+def get_user_angel_stats(platform: str, chat_id: int, user_id: int, limit: int = 5) -> tuple[int, list[tuple[str, int]]]:
+    """
+    Возвращает:
+      - total (сколько раз всего видел ангельское время в этом чате)
+      - top: список (time_value, count) топ-N
+    Один запрос по первичному ключу счётчиков; total считается оконной суммой до LIMIT.
+    """
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
-                INSERT INTO angel_time_stats (platform, chat_id, user_id, time_value)
-                VALUES (%s, %s, %s, %s);
+                SELECT time_value, hits, SUM(hits) OVER () AS total
+                FROM angel_time_user_stats
+                WHERE platform=%s AND chat_id=%s AND user_id=%s
+                ORDER BY hits DESC, time_value ASC
+                LIMIT %s;
                 """,
-                (platform, int(chat_id), int(user_id), time_value),
+                (platform, int(chat_id), int(user_id), int(limit)),
             )
-        conn.commit()
+            rows = cur.fetchall()
 
+    if not rows:
+        return 0, []
+    total = int(rows[0][2])
+    top = [(str(t), int(c)) for (t, c, _total) in rows]
+    return total, top
 
-def get_user_angel_stats(platform: str, chat_id: int, user_id: int, limit: int = 5) -> tuple[int, list[tuple[str, int]]]:
+
+# ---------------- Карта дня (если TAROT_STATE_BACKEND=pg) ----------------
+
+def tarot_get_card(source: str, user_id: int, day: str) -> str | None:
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT card FROM tarot_daily WHERE source=%s AND user_id=%s AND day=%s;",
+                (source, int(user_id), day),
+            )
+            row = cur.fetchone()
+            return str(row[0]) if row else None
+
+
+def tarot_claim_card(source: str, user_id: int, day: str, card: str) -> tuple[str, bool]:
     """
-    Возвращает:
-      - total (сколько раз всего видел ангельское время в этом чате)
-      - top: список (time_value, count) топ-N
+    Атомарный insert-if-absent.
+    Возвращает (карта, True) если записали сейчас, иначе (уже выданная карта, False).
     """
-    with psycopg2.connect(_dsn()) as conn:
+    with _conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT COUNT(*)
-                FROM angel_time_stats
-                WHERE platform=%s AND chat_id=%s AND user_id=%s;
+                INSERT INTO tarot_daily (source, user_id, day, card)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT DO NOTHING
+                RETURNING card;
                 """,
-                (platform, int(chat_id), int(user_id)),
+                (source, int(user_id), day, card),
+            )
+            if cur.fetchone():
+                return card, True
+            cur.execute(
+                "SELECT card FROM tarot_daily WHERE source=%s AND user_id=%s AND day=%s;",
+                (source, int(user_id), day),
             )
-            total = int(cur.fetchone()[0])
+            row = cur.fetchone()
+            return (str(row[0]) if row else card), False
 
+
+def tarot_put_card(source: str, user_id: int, day: str, card: str) -> None:
+    with _conn() as conn:
+        with conn.cursor() as cur:
             cur.execute(
                 """
-                SELECT time_value, COUNT(*) AS c
-                FROM angel_time_stats
-                WHERE platform=%s AND chat_id=%s AND user_id=%s
-                GROUP BY time_value
-                ORDER BY c DESC, time_value ASC
-                LIMIT %s;
+                INSERT INTO tarot_daily (source, user_id, day, card)
+                VALUES (%s, %s, %s, %s)
+                ON CONFLICT (source, user_id, day) DO UPDATE SET card = EXCLUDED.card;
                 """,
-                (platform, int(chat_id), int(user_id), int(limit)),
+                (source, int(user_id), day, card),
             )
-            top = [(str(t), int(c)) for (t, c) in cur.fetchall()]
 
-    return total, top
+
+def tarot_reset_card(source: str, user_id: int, day: str) -> bool:
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "DELETE FROM tarot_daily WHERE source=%s AND user_id=%s AND day=%s;",
+                (source, int(user_id), day),
+            )
+            return cur.rowcount > 0
+
+
+def tarot_prune_cards(before_day: str) -> None:
+    """Удаляем записи за прошедшие дни."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM tarot_daily WHERE day < %s;", (before_day,))
+
+
+# ---------------- Рассылки (админ /all и т.п.) ----------------
+
+def create_broadcast(text: str, targets: list[tuple[str, int]], owner: str) -> int:
+    """Создаёт задание (сразу за воркером owner) и список получателей, возвращает id задания."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "INSERT INTO broadcast_jobs (text, owner, heartbeat_at) VALUES (%s, %s, NOW()) RETURNING id;",
+                (text, owner),
+            )
+            job_id = int(cur.fetchone()[0])
+            if targets:
+                execute_values(
+                    cur,
+                    "INSERT INTO broadcast_targets (job_id, platform, chat_id) VALUES %s ON CONFLICT DO NOTHING;",
+                    [(job_id, p, int(c)) for p, c in targets],
+                    page_size=1000,
+                )
+            return job_id
+
+
+def claim_broadcasts(owner: str, lease_sec: float) -> list[tuple[int, str]]:
+    """
+    Забрать себе незавершённые рассылки без владельца или с устаревшим heartbeat.
+    SKIP LOCKED: воркеры, стартующие одновременно, делят задания, а не берут одно и то же.
+    """
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE broadcast_jobs SET owner = %s, heartbeat_at = NOW()
+                WHERE id IN (
+                    SELECT id FROM broadcast_jobs
+                    WHERE status = 'running'
+                      AND (owner IS NULL OR heartbeat_at < NOW() - make_interval(secs => %s))
+                    ORDER BY id
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, text;
+                """,
+                (owner, float(lease_sec)),
+            )
+            return sorted((int(i), str(t)) for i, t in cur.fetchall())
+
+
+def heartbeat_broadcast(job_id: int, owner: str) -> bool:
+    """Продлить владение; False — задание уже забрал другой воркер (или оно завершено)."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE broadcast_jobs SET heartbeat_at = NOW()
+                WHERE id = %s AND owner = %s AND status = 'running';
+                """,
+                (int(job_id), owner),
+            )
+            return cur.rowcount == 1
+
+
+def release_broadcasts(job_ids: list[int], owner: str) -> None:
+    """При остановке воркера: отдать незавершённые рассылки, чтобы их сразу подхватил другой."""
+    if not job_ids:
+        return
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE broadcast_jobs SET owner = NULL WHERE id = ANY(%s) AND owner = %s;",
+                ([int(i) for i in job_ids], owner),
+            )
+
+
+def broadcast_progress(limit: int = 3) -> list[tuple[int, str, int, int, int]]:
+    """Последние рассылки: [(id, status, total, sent, failed), ...], свежие первыми."""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT j.id, j.status,
+                       COUNT(t.chat_id),
+                       COUNT(*) FILTER (WHERE t.status = 'sent'),
+                       COUNT(*) FILTER (WHERE t.status = 'failed')
+                FROM (SELECT id, status FROM broadcast_jobs ORDER BY id DESC LIMIT %s) AS j
+                LEFT JOIN broadcast_targets t ON t.job_id = j.id
+                GROUP BY j.id, j.status
+                ORDER BY j.id DESC;
+                """,
+                (int(limit),),
+            )
+            return [(int(i), str(s), int(n), int(ok), int(bad)) for i, s, n, ok, bad in cur.fetchall()]
+
+
+def broadcast_targets(job_id: int) -> list[tuple[str, int, str, int]]:
+    """[(platform, chat_id, status, attempts), ...]"""
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT platform, chat_id, status, attempts FROM broadcast_targets WHERE job_id = %s;",
+                (int(job_id),),
+            )
+            return [(str(p), int(c), str(s), int(a)) for p, c, s, a in cur.fetchall()]
+
+
+def mark_broadcast_target(job_id: int, platform: str, chat_id: int, status: str, attempts: int) -> None:
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                UPDATE broadcast_targets SET status = %s, attempts = %s
+                WHERE job_id = %s AND platform = %s AND chat_id = %s;
+                """,
+                (status, int(attempts), int(job_id), platform, int(chat_id)),
+            )
+
+
+def finish_broadcast(job_id: int) -> None:
+    with _conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "UPDATE broadcast_jobs SET status = 'done', finished_at = NOW(), owner = NULL WHERE id = %s;",
+                (int(job_id),),
+            )
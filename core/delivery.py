@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, Tuple
+
+from adapters.tg_sender import (
+    RateLimited,
+    chat_send_delay as tg_chat_send_delay,
+    deliver_actions_tg,
+    send_typing_tg,
+    typing_delay_seconds as tg_typing_delay,
+)
+from adapters.vk_sender import deliver_actions_vk, send_typing_vk, typing_delay_seconds as vk_typing_delay
+from core.executor import run_send
+from settings import DELIVERY_WORKERS, DELIVERY_QUEUE_MAX, SEND_MAX_REQUEUES, TG_SEND_CONCURRENCY, VK_SEND_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Очередь исходящих ответов.
+#
+# - общий лимит DELIVERY_QUEUE_MAX: если очередь полна, submit() ждёт (backpressure);
+# - в одном чате ответы уходят строго по очереди (FIFO): пока чат обслуживается
+#   одним воркером, его следующие задания ждут в _pending и другим воркерам не достаются;
+# - разные чаты обслуживаются параллельно DELIVERY_WORKERS воркерами;
+# - на платформу не больше TG_/VK_SEND_CONCURRENCY одновременных HTTP-вызовов
+#   (пауза "печатает" в этот лимит не входит);
+# - темп одного чата Telegram (~20 сообщений в минуту в группе) выдерживается здесь,
+#   через asyncio.sleep до захвата лимита и потока, а не sleep в потоке отправки;
+# - на 429 от Telegram поток отправки не ждёт: неотправленный остаток ответа
+#   возвращается в начало очереди чата и уходит после retry_after.
+
+
+@dataclass
+class _Job:
+    platform: str
+    chat_id: int
+    actions: list
+    seed: int = 0
+    typing: bool = True
+    requeues: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+# (platform, chat_id) -> задания этого чата; ключ есть, пока у чата есть работа
+_pending: Dict[Tuple[str, int], Deque[_Job]] = {}
+_ready: asyncio.Queue | None = None
+_slots: asyncio.Semaphore | None = None
+_limits: Dict[str, asyncio.Semaphore] = {}
+_workers: list[asyncio.Task] = []
+
+_stats = {
+    "delivered": 0,
+    "failed": 0,
+    "in_flight": 0,
+    "last_lag_sec": 0.0,
+    "max_lag_sec": 0.0,
+}
+
+
+def _depth() -> int:
+    return sum(len(q) for q in _pending.values())
+
+
+def delivery_stats() -> dict:
+    oldest = 0.0
+    now = time.monotonic()
+    for q in _pending.values():
+        if q:
+            oldest = max(oldest, now - q[0].enqueued_at)
+    return {
+        **_stats,
+        "queued": _depth(),
+        "chats": len(_pending),
+        "oldest_wait_sec": round(oldest, 3),
+        "workers": len(_workers),
+    }
+
+
+async def submit(platform: str, chat_id: int, actions, seed: int = 0, typing: bool = True) -> None:
+    """Поставить ответ в очередь. Если очередь переполнена — ждём свободного места."""
+    if not actions:
+        return
+    if _slots is None:
+        raise RuntimeError("delivery queue is not started")
+
+    await _slots.acquire()
+
+    key = (platform, int(chat_id))
+    job = _Job(platform=platform, chat_id=int(chat_id), actions=list(actions), seed=seed, typing=typing)
+
+    q = _pending.get(key)
+    if q is None:
+        # чат сейчас никто не обслуживает — отдаём воркерам
+        _pending[key] = deque([job])
+        _ready.put_nowait(key)
+    else:
+        # чат уже в работе — встанет в хвост, воркер заберёт по порядку
+        q.append(job)
+
+
+async def _call(platform: str, fn, *args) -> None:
+    async with _limits[platform]:
+        await run_send(fn, *args)
+
+
+async def _deliver(job: _Job) -> None:
+    if job.platform == "tg":
+        # лимит чата берём сразу: ожидание совпадает с паузой "печатает"
+        ready_at = time.monotonic() + tg_chat_send_delay(job.chat_id, len(job.actions))
+        if job.typing:
+            await _call("tg", send_typing_tg, job.chat_id)
+            await asyncio.sleep(tg_typing_delay())
+        wait = ready_at - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        await _call("tg", deliver_actions_tg, job.chat_id, job.actions, True)
+    elif job.platform == "vk":
+        if job.typing:
+            await _call("vk", send_typing_vk, job.chat_id)
+            await asyncio.sleep(vk_typing_delay())
+        await _call("vk", deliver_actions_vk, job.chat_id, job.actions, job.seed)
+    else:
+        raise ValueError(f"unknown platform: {job.platform}")
+
+
+async def _worker() -> None:
+    while True:
+        key = await _ready.get()
+        q = _pending[key]
+        job = q.popleft()
+
+        lag = time.monotonic() - job.enqueued_at
+        _stats["last_lag_sec"] = round(lag, 3)
+        _stats["max_lag_sec"] = round(max(_stats["max_lag_sec"], lag), 3)
+        _stats["in_flight"] += 1
+        retry_after = None
+        try:
+            await _deliver(job)
+            _stats["delivered"] += 1
+        except asyncio.CancelledError:
+            raise
+        except RateLimited as e:
+            if job.requeues < SEND_MAX_REQUEUES:
+                # остаток — обратно в начало очереди чата, место в очереди (слот) за ним сохраняется
+                q.appendleft(_Job(
+                    platform=job.platform,
+                    chat_id=job.chat_id,
+                    actions=e.actions,
+                    seed=job.seed,
+                    typing=False,
+                    requeues=job.requeues + 1,
+                ))
+                retry_after = e.retry_after
+                logger.warning("delivery to %s:%s: 429, %d message(s) requeued for %.1fs",
+                               job.platform, job.chat_id, len(e.actions), e.retry_after)
+            else:
+                _stats["failed"] += 1
+                logger.error("delivery to %s:%s: %d message(s) dropped after %d requeues on 429",
+                             job.platform, job.chat_id, len(e.actions), job.requeues)
+        except Exception:
+            _stats["failed"] += 1
+            logger.exception("delivery to %s:%s failed", job.platform, job.chat_id)
+        finally:
+            _stats["in_flight"] -= 1
+            if retry_after is not None:
+                asyncio.get_running_loop().call_later(retry_after, _ready.put_nowait, key)
+            else:
+                _slots.release()
+                if q:
+                    _ready.put_nowait(key)
+                else:
+                    _pending.pop(key, None)
+
+
+def start_delivery() -> None:
+    """Запускается на старте приложения (нужен работающий event loop)."""
+    global _ready, _slots
+    if _workers:
+        return
+    _ready = asyncio.Queue()
+    _slots = asyncio.Semaphore(DELIVERY_QUEUE_MAX)
+    _limits["tg"] = asyncio.Semaphore(TG_SEND_CONCURRENCY)
+    _limits["vk"] = asyncio.Semaphore(VK_SEND_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    for _ in range(DELIVERY_WORKERS):
+        _workers.append(loop.create_task(_worker()))
+
+
+async def stop_delivery(timeout: float = 15.0) -> None:
+    """Даём очереди дослать то, что успеет за timeout секунд, затем останавливаем воркеров."""
+    deadline = time.monotonic() + timeout
+    while (_pending or _stats["in_flight"]) and time.monotonic() < deadline:
+        await asyncio.sleep(0.2)
+
+    for t in _workers:
+        t.cancel()
+    for t in _workers:
+        try:
+            await t
+        except asyncio.CancelledError:
+            pass
+    _workers.clear()
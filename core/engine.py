@@ -1,64 +1,71 @@
-from modules.admin_commands.handler import handle_admin_command
-from modules.simple_replies.handler import get_simple_reply
-from modules.tarot_day.handler import get_tarot_day_reply
+import inspect
 
-from modules.angel_time.handler import get_angel_time_reply
-from settings import ANGEL_TIME_TZ
+from core.router import Message, Route, Router
 
-from modules.lunar_day.handler import get_lunar_day_reply
-from settings import LUNAR_TZ
+from modules.admin_commands import handler as admin_commands
+from modules.simple_replies import handler as simple_replies
+from modules.tarot_day import handler as tarot_day
 
-from modules.horoscope.handler import get_horoscope_reply
+from modules.angel_time import handler as angel_time
+from settings import ANGEL_TIME_TZ
 
-from modules.who_today.handler import get_who_today_reply
+from modules.lunar_day import handler as lunar_day
+from settings import LUNAR_TZ
 
+from modules.horoscope import handler as horoscope
 
+from modules.who_today import handler as who_today
 
 
+async def _admin(m: Message):
+    action = admin_commands.handle_admin_command(m.source, m.user_id, m.text)
+    if inspect.isawaitable(action):
+        action = await action
+    return [action] if action else None
 
-async def build_reply_actions(text: str, user_id: int, chat_id: int, source: str = "unknown"):
 
-    # Проверка админа
-    admin_action = handle_admin_command(source, user_id, text)
-    if admin_action:
-        return [admin_action]
+# Порядок = приоритет (как была цепочка if-ов).
+# blocking=True -> модуль ходит в Postgres/файлы/сеть и выполняется в пуле потоков.
+_ROUTER = Router([
+    # Проверка админа (в event loop: рассылка планирует задачи именно в нём)
+    Route("admin", admin_commands.MATCH_SPEC, _admin),
 
     # 🪽 Ангельское время
-    actions = get_angel_time_reply(
-        text=text,
-        platform=source,   # "tg" или "vk"
-        chat_id=chat_id,
-        user_id=user_id,
-        tz_name=ANGEL_TIME_TZ,
-    )
-    if actions:
-        return actions
-
-    #Лунный день
-    actions = get_lunar_day_reply(text, tz_name=LUNAR_TZ)
-    if actions:
-        return actions
-
+    Route(
+        "angel_time",
+        angel_time.MATCH_SPEC,
+        lambda m: angel_time.get_angel_time_reply(
+            text=m.text,
+            platform=m.source,   # "tg" или "vk"
+            chat_id=m.chat_id,
+            user_id=m.user_id,
+            tz_name=ANGEL_TIME_TZ,
+        ),
+        blocking=True,
+    ),
+
+    # Лунный день
+    Route("lunar_day", lunar_day.MATCH_SPEC, lambda m: lunar_day.get_lunar_day_reply(m.text, tz_name=LUNAR_TZ), blocking=True),
 
     # 1️⃣ Карта дня
-    actions = get_tarot_day_reply(text, user_id, source=source)
-    if actions:
-        return actions
+    Route("tarot_day", tarot_day.MATCH_SPEC, lambda m: tarot_day.get_tarot_day_reply(m.text, m.user_id, source=m.source), blocking=True),
 
-    # 🔮 Гороскоп
-    actions = get_horoscope_reply(text, source, chat_id, user_id)
-    if actions:
-        return actions
+    # 🔮 Гороскоп (async: сеть уходит в пул потоков внутри модуля, с кешем и склейкой запросов)
+    Route("horoscope", horoscope.MATCH_SPEC, lambda m: horoscope.get_horoscope_reply(m.text, m.source, m.chat_id, m.user_id)),
 
     # 🎭 Кто сегодня...
-    actions = get_who_today_reply(text, platform=source, chat_id=chat_id, user_id=user_id)
-    if actions:
-        return actions
-
+    Route(
+        "who_today",
+        who_today.MATCH_SPEC,
+        lambda m: who_today.get_who_today_reply(m.text, platform=m.source, chat_id=m.chat_id, user_id=m.user_id),
+        blocking=True,
+    ),
 
     # 2️⃣ Простые ответы
-    actions = await get_simple_reply(text, user_id, chat_id)
-    return actions
-
+    Route("simple_replies", simple_replies.MATCH_SPEC, lambda m: simple_replies.get_simple_reply(m.text, m.user_id, m.chat_id)),
+])
 
 
+async def build_reply_actions(text: str, user_id: int, chat_id: int, source: str = "unknown"):
+    msg = Message.build(text, user_id, chat_id, source)
+    return await _ROUTER.dispatch(msg)
@@ -0,0 +1,48 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from settings import MODULE_WORKERS, SEND_WORKERS
+
+# Общий пул потоков для блокирующей работы модулей (Postgres, файлы, HTTP).
+# Размер пула = лимит одновременных блокирующих операций: если один запрос
+# к базе завис, остальные чаты обслуживаются свободными потоками,
+# а event loop не блокируется вообще.
+
+# Отдельный пул для исходящих HTTP-запросов к Telegram/VK: поток занят только
+# на время самого запроса (паузы "печатает..." — это asyncio.sleep, не поток),
+# и отправка не конкурирует за потоки с обработчиками модулей.
+
+_executors: dict[str, ThreadPoolExecutor] = {}
+_lock = threading.Lock()
+
+
+def _get_executor(name: str, size: int) -> ThreadPoolExecutor:
+    ex = _executors.get(name)
+    if ex is None:
+        with _lock:
+            ex = _executors.get(name)
+            if ex is None:
+                ex = ThreadPoolExecutor(max_workers=size, thread_name_prefix=name)
+                _executors[name] = ex
+    return ex
+
+
+async def run_blocking(fn, *args, **kwargs):
+    """Выполнить синхронную функцию в общем пуле, не блокируя event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor("module", MODULE_WORKERS), functools.partial(fn, *args, **kwargs))
+
+
+async def run_send(fn, *args, **kwargs):
+    """То же для HTTP-вызовов отправителей (adapters/*_sender.py)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor("send", SEND_WORKERS), functools.partial(fn, *args, **kwargs))
+
+
+def shutdown_executor() -> None:
+    with _lock:
+        for ex in _executors.values():
+            ex.shutdown(wait=True)
+        _executors.clear()
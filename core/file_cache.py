@@ -0,0 +1,36 @@
+import os
+import threading
+from typing import Any, Callable
+
+# (путь, парсер) -> ((size, mtime_ns) | None, результат парсера)
+_CACHE: dict[tuple[str, Callable], tuple[tuple[int, int] | None, Any]] = {}
+_LOCK = threading.Lock()
+
+
+def _signature(path: str) -> tuple[int, int] | None:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+def load_cached(path: str, parser: Callable[[str], Any]) -> Any:
+    """
+    parser(path), но только при первом обращении или если файл поменялся (size/mtime).
+    На каждый запрос остаётся один stat(), без чтения и разбора файла.
+    Результат парсера общий для всех вызовов — его нельзя менять на месте.
+    """
+    path = os.path.abspath(path)
+    key = (path, parser)
+    sig = _signature(path)
+
+    with _LOCK:
+        memo = _CACHE.get(key)
+    if memo is not None and memo[0] == sig:
+        return memo[1]
+
+    value = parser(path)
+    with _LOCK:
+        _CACHE[key] = (sig, value)
+    return value
@@ -1,9 +1,9 @@
-import asyncio
 import time
 import logging
 from typing import Dict, Tuple
 
-from core.chat_store_pg import init_pg, upsert_chat, load_chats
+from core.activity_buffer import buffer_chat
+from core.chat_store_pg import load_chats, run_db
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +15,8 @@ def touch(platform: str, chat_id: int) -> None:
     """Запоминаем чат (нужно для рассылок и чтобы бот 'помнил' чаты после деплоя)."""
     _last_activity[(platform, int(chat_id))] = time.time()
 
-    # Сохраняем чат в Postgres, не блокируя обработку сообщений
-    try:
-        loop = asyncio.get_running_loop()
-        loop.create_task(asyncio.to_thread(upsert_chat, platform, int(chat_id)))
-    except RuntimeError:
-        # на всякий случай: если вызвали без event loop
-        pass
+    # В Postgres чат попадёт пачкой при ближайшем сбросе буфера активности
+    buffer_chat(platform, int(chat_id))
 
 
 def get_known_chats(platform: str | None = None):
@@ -52,6 +47,5 @@ def get_group_chats(platform: str | None = None):
 
 async def init_known_chats():
     """Загрузка известных чатов из Postgres в память при старте приложения."""
-    await asyncio.to_thread(init_pg)
-    data = await asyncio.to_thread(load_chats)
+    data = await run_db(load_chats)
     _last_activity.update(data)
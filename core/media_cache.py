@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+def _data_dir() -> Path:
+    # project_root/ data/
+    data_dir = Path(__file__).resolve().parents[1] / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return data_dir
+
+
+# path -> (size, mtime_ns, sha256): чтобы не хешировать одну и ту же картинку на каждый запрос
+_digests: dict[str, tuple[int, int, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def file_digest(path: str) -> str:
+    """sha256 содержимого файла; пересчитывается, только если поменялись размер или mtime."""
+    st = os.stat(path)
+    with _digests_lock:
+        memo = _digests.get(path)
+    if memo and memo[0] == st.st_size and memo[1] == st.st_mtime_ns:
+        return memo[2]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+
+    with _digests_lock:
+        _digests[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+
+class MediaCache:
+    """
+    Хеш содержимого файла -> id уже загруженного на платформу файла
+    (VK attachment "photo..._...", Telegram file_id).
+
+    Хранится в data/<name>.json, чтобы переживать рестарт. Ключ — хеш, а не путь:
+    если картинку заменили, хеш другой, и файл загрузится заново.
+    """
+
+    def __init__(self, name: str):
+        self._path = _data_dir() / f"{name}.json"
+        self._lock = threading.Lock()
+        self._items: dict[str, str] = self._load()
+
+    def _load(self) -> dict[str, str]:
+        try:
+            raw = json.loads(self._path.read_text(encoding="utf-8")) or {}
+        except FileNotFoundError:
+            return {}
+        except Exception:
+            # если файл повредился — начнем с чистого
+            return {}
+        return {str(k): str(v) for k, v in raw.items() if v}
+
+    def _save(self) -> None:
+        # пишем во временный файл и подменяем — чтобы не получить обрезанный JSON;
+        # имя временного файла своё у каждого процесса (воркеры пишут одновременно)
+        tmp = None
+        try:
+            with tempfile.NamedTemporaryFile(
+                "w", encoding="utf-8", dir=self._path.parent,
+                prefix=self._path.name + ".", suffix=".tmp", delete=False,
+            ) as f:
+                tmp = f.name
+                json.dump(self._items, f, ensure_ascii=False)
+            os.replace(tmp, self._path)
+        except OSError:
+            logger.exception("media cache %s: save failed", self._path.name)
+            if tmp is not None:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+
+    def get(self, file_path: str) -> str | None:
+        try:
+            key = file_digest(file_path)
+        except OSError:
+            return None
+        with self._lock:
+            return self._items.get(key)
+
+    def put(self, file_path: str, remote_id: str) -> None:
+        try:
+            key = file_digest(file_path)
+        except OSError:
+            return
+        with self._lock:
+            if self._items.get(key) == remote_id:
+                return
+            self._items[key] = remote_id
+            self._save()
+
+    def drop(self, file_path: str) -> None:
+        try:
+            key = file_digest(file_path)
+        except OSError:
+            return
+        with self._lock:
+            if self._items.pop(key, None) is not None:
+                self._save()
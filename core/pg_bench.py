@@ -0,0 +1,197 @@
+"""
+Проверка планов и бенчмарк запросов "Кто сегодня" на живом Postgres.
+
+    DATABASE_URL=postgresql://localhost/dev python -m core.pg_bench [--members 10000] [--days 365]
+
+Всё делается во временной схеме внутри одной транзакции, которая в конце
+откатывается, — в базе ничего не остаётся. Схема создаётся теми же MIGRATIONS,
+что и на проде, запросы — те же константы из core/chat_store_pg.py.
+
+Падает (ненулевой код выхода), если:
+- план кандидатов читает chat_users последовательно или не использует chat_users_recent_idx;
+- медианное время выполнения кандидатов на сервере >= --max-ms.
+
+Кандидаты — все активные за WHO_TODAY_ACTIVE_DAYS участники (выборка по весам идёт
+уже в Python, modules/who_today/selection): диапазон по индексу и проверка "нет титула
+сегодня" по первичному ключу. Сколько раз кто получал титул, запрос не считает (это
+агрегат по всей истории чата) — счётчики берутся из core/roster. Обычно это запасной
+путь — в работе кандидаты берутся из core/roster целиком.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import date
+
+import psycopg2
+
+from core.chat_store_pg import CANDIDATES_SQL, MIGRATIONS, TITLE_STATS_SQL
+from modules.who_today.selection import DEFAULT_WEIGHTING, choose
+
+PLATFORM = "tg"
+CHAT_ID = -1001
+
+
+def _seed(cur, members: int, days: int, noise_chats: int, assigned_today: int) -> None:
+    # целевой чат: members участников, last_seen в пределах года
+    cur.execute(
+        """
+        INSERT INTO chat_users (platform, chat_id, user_id, display_name, last_seen)
+        SELECT %s, %s, u, 'user ' || u, NOW() - random() * INTERVAL '365 days'
+        FROM generate_series(1, %s) AS u;
+        """,
+        (PLATFORM, CHAT_ID, members),
+    )
+    # другие чаты — чтобы индекс выбирал нужный чат, а не весь chat_users
+    cur.execute(
+        """
+        INSERT INTO chat_users (platform, chat_id, user_id, display_name, last_seen)
+        SELECT %s, -2000 - c, u, NULL, NOW() - random() * INTERVAL '365 days'
+        FROM generate_series(1, %s) AS c, generate_series(1, 2000) AS u;
+        """,
+        (PLATFORM, noise_chats),
+    )
+    # год назначений: по 10 титулов в день
+    cur.execute(
+        """
+        INSERT INTO who_today_assignments (platform, chat_id, day, user_id, title)
+        SELECT %s, %s, CURRENT_DATE - d, 1 + floor(random() * %s)::bigint, 'титул ' || (d %% 50)
+        FROM generate_series(1, %s) AS d, generate_series(1, 10) AS k
+        ON CONFLICT DO NOTHING;
+        """,
+        (PLATFORM, CHAT_ID, members, days),
+    )
+    # сегодня титулы уже получили самые активные — запросу приходится их пропускать
+    cur.execute(
+        """
+        INSERT INTO who_today_assignments (platform, chat_id, day, user_id, title)
+        SELECT platform, chat_id, CURRENT_DATE, user_id, 'кот'
+        FROM chat_users
+        WHERE platform = %s AND chat_id = %s
+        ORDER BY last_seen DESC
+        LIMIT %s;
+        """,
+        (PLATFORM, CHAT_ID, assigned_today),
+    )
+    cur.execute("ANALYZE chat_users;")
+    cur.execute("ANALYZE who_today_assignments;")
+
+
+def _explain(cur, sql: str, params) -> dict:
+    cur.execute("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql, params)
+    raw = cur.fetchone()[0]
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    return raw[0]
+
+
+def _nodes(plan: dict):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from _nodes(child)
+
+
+def _plan_problems(plan: dict) -> list[str]:
+    problems = []
+    for node in _nodes(plan["Plan"]):
+        kind = node["Node Type"]
+        if kind == "Seq Scan" and node.get("Relation Name") == "chat_users":
+            problems.append("Seq Scan по chat_users")
+    used = {node.get("Index Name") for node in _nodes(plan["Plan"])}
+    if "chat_users_recent_idx" not in used:
+        problems.append("не используется chat_users_recent_idx")
+    return problems
+
+
+def _time_ms(cur, sql: str, params, runs: int) -> tuple[float, float]:
+    """(медиана, p95) времени выполнения на сервере по EXPLAIN ANALYZE, мс."""
+    samples = sorted(_explain(cur, sql, params)["Execution Time"] for _ in range(runs))
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--members", type=int, default=10_000)
+    ap.add_argument("--days", type=int, default=365)
+    ap.add_argument("--noise-chats", type=int, default=20)
+    ap.add_argument("--assigned-today", type=int, default=150)
+    ap.add_argument("--runs", type=int, default=200)
+    ap.add_argument("--max-ms", type=float, default=1.0)
+    args = ap.parse_args()
+
+    dsn = os.getenv("DATABASE_URL", "").strip()
+    if not dsn:
+        print("DATABASE_URL is not set", file=sys.stderr)
+        return 2
+
+    conn = psycopg2.connect(dsn)
+    ok = True
+    try:
+        with conn.cursor() as cur:
+            schema = f"pg_bench_{os.getpid()}"
+            cur.execute(f"CREATE SCHEMA {schema};")
+            cur.execute(f"SET LOCAL search_path TO {schema};")
+            for _version, _name, statements in MIGRATIONS:
+                for sql in statements:
+                    cur.execute(sql)
+
+            t = time.perf_counter()
+            _seed(cur, args.members, args.days, args.noise_chats, args.assigned_today)
+            print(f"seed: {time.perf_counter() - t:.1f} s "
+                  f"({args.members} участников, {args.days} дней назначений, {args.noise_chats} других чатов)")
+
+            now = time.time()
+            candidates = {
+                "platform": PLATFORM,
+                "chat_id": CHAT_ID,
+                "day": date.today(),
+                "active_since": DEFAULT_WEIGHTING.active_since(now),
+            }
+            stats = (PLATFORM, CHAT_ID, 10)
+
+            # план без нового индекса — для сравнения (откатываем через savepoint)
+            cur.execute("SAVEPOINT no_index;")
+            cur.execute("DROP INDEX chat_users_recent_idx;")
+            before = _explain(cur, CANDIDATES_SQL, candidates)
+            cur.execute("ROLLBACK TO SAVEPOINT no_index;")
+
+            plan = _explain(cur, CANDIDATES_SQL, candidates)
+            cur.execute("EXPLAIN (ANALYZE, BUFFERS) " + CANDIDATES_SQL, candidates)
+            print("\n".join(r[0] for r in cur.fetchall()))
+
+            problems = _plan_problems(plan)
+            for p in problems:
+                print(f"PLAN REGRESSION: {p}")
+            ok = ok and not problems
+
+            med, p95 = _time_ms(cur, CANDIDATES_SQL, candidates, args.runs)
+            print(f"\nкандидаты: без индекса {before['Execution Time']:.3f} мс, "
+                  f"с индексом медиана {med:.3f} мс, p95 {p95:.3f} мс")
+            if med >= args.max_ms:
+                print(f"TOO SLOW: медиана {med:.3f} мс >= {args.max_ms} мс")
+                ok = False
+
+            # полный путь запасного режима: запрос + взвешенная выборка по строкам курсора
+            cur.execute(CANDIDATES_SQL, candidates)
+            rows = [(int(u), n, float(ts), 0) for (u, n, ts) in cur.fetchall()]
+            t = time.perf_counter()
+            picked = choose(rows, author_id=1, now=now)
+            print(f"выборка по {len(rows)} активным: {(time.perf_counter() - t) * 1000:.3f} мс, "
+                  f"первые: {[uid for uid, _ in picked]}")
+
+            med, p95 = _time_ms(cur, TITLE_STATS_SQL, stats, args.runs)
+            print(f"топ титулов: медиана {med:.3f} мс, p95 {p95:.3f} мс")
+    finally:
+        # временная схема и все данные исчезают вместе с транзакцией
+        conn.rollback()
+        conn.close()
+
+    print("OK" if ok else "FAILED")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
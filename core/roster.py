@@ -0,0 +1,196 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import date, timedelta
+from typing import Callable
+
+from settings import ROSTER_REFRESH_SEC
+
+logger = logging.getLogger(__name__)
+
+# Кто писал в каком чате — в памяти процесса, для "Кто сегодня" без запроса в БД.
+# Пополняется из входящих сообщений (app.py), на старте прогревается из chat_users.
+# В БД те же данные пишет activity_buffer, так что после рестарта ничего не теряется.
+#
+# Gunicorn-воркеров несколько, и каждый видит только свои webhook'и, поэтому раз в
+# ROSTER_REFRESH_SEC память догоняет базу: новые/обновлённые строки chat_users и
+# выданные другими воркерами титулы (по last_seen / created_at больше водяного знака).
+
+# (platform, chat_id) -> {user_id: (display_name, last_seen_ts)}
+_rosters: dict[tuple[str, int], dict[int, tuple[str | None, float]]] = {}
+# (platform, chat_id) -> {день: {user_id, ...}} — кому выдан титул (только сегодня и вчера)
+_assigned: dict[tuple[str, int], dict[date, set[int]]] = {}
+# (platform, chat_id) -> {user_id: сколько раз получал титул за всё время}
+_picks: dict[tuple[str, int], dict[int, int]] = {}
+_lock = threading.Lock()
+_warm = False
+
+# Строки в chat_users пишутся с ts воркера и с задержкой сброса буфера, поэтому
+# перечитываем с запасом: повторно прочитанное ничего не ломает (observe берёт max,
+# mark_assigned считает титул один раз).
+_REFRESH_OVERLAP_SEC = 300
+_users_mark = 0.0
+_assigned_mark = 0.0
+_task: asyncio.Task | None = None
+
+
+def observe(platform: str, chat_id: int, user_id: int, display_name: str | None = None, ts: float | None = None) -> None:
+    """Пользователь написал в чате (имя None — оставляем известное раньше)."""
+    ts = time.time() if ts is None else ts
+    key = (platform, int(chat_id))
+    uid = int(user_id)
+    with _lock:
+        members = _rosters.setdefault(key, {})
+        prev = members.get(uid)
+        if prev is not None:
+            if display_name is None:
+                display_name = prev[0]
+            ts = max(ts, prev[1])
+        members[uid] = (display_name, ts)
+
+
+def _mark(key: tuple[str, int], day: date, uid: int, count: bool) -> None:
+    # вызывается под _lock
+    days = _assigned.setdefault(key, {})
+    taken = days.get(day)
+    if taken is None:
+        taken = days[day] = set()
+        for old in [d for d in days if d < day - timedelta(days=1)]:
+            del days[old]
+    if uid not in taken:
+        taken.add(uid)
+        if count:
+            picks = _picks.setdefault(key, {})
+            picks[uid] = picks.get(uid, 0) + 1
+
+
+def mark_assigned(platform: str, chat_id: int, day: date, user_id: int, count: bool = True) -> None:
+    """Титул выдан (count=False — только исключить на этот день, в счётчик не идёт)."""
+    with _lock:
+        _mark((platform, int(chat_id)), day, int(user_id), count=count)
+
+
+def size(platform: str, chat_id: int) -> int:
+    with _lock:
+        return len(_rosters.get((platform, int(chat_id)), ()))
+
+
+def candidates(platform: str, chat_id: int, day: date, active_since: float = 0.0) -> list[tuple[int, str | None, float, int]]:
+    """
+    Участники чата, писавшие не раньше active_since и без титула в этот день:
+    [(user_id, display_name, last_seen_ts, сколько раз получал титул), ...] — для modules/who_today/selection.
+    """
+    key = (platform, int(chat_id))
+    with _lock:
+        members = _rosters.get(key)
+        if not members:
+            return []
+        taken = _assigned.get(key, {}).get(day, ())
+        picks = _picks.get(key, {})
+        return [
+            (uid, name, ts, picks.get(uid, 0))
+            for uid, (name, ts) in members.items()
+            if ts >= active_since and uid not in taken
+        ]
+
+
+def pick_counts(platform: str, chat_id: int) -> dict[int, int]:
+    """{user_id: сколько раз получал титул} — для выборки по кандидатам из Postgres."""
+    with _lock:
+        return dict(_picks.get((platform, int(chat_id)), {}))
+
+
+def is_warm() -> bool:
+    """Прогрет ли кеш из БД (если нет — "Кто сегодня" читает кандидатов из Postgres)."""
+    return _warm
+
+
+def warm_from_db(day: date) -> None:
+    """
+    На старте: все chat_users, сколько раз кто получал титул и выданные в этот день титулы.
+    Вызывается в потоке (run_db); ошибки не фатальны — кеш просто остаётся холодным.
+    """
+    global _warm, _users_mark, _assigned_mark
+    try:
+        from core.chat_store_pg import load_chat_users, load_assignments_since, load_pick_counts
+
+        # водяные знаки — до чтения: всё, что запишут во время прогрева, догонит refresh
+        started = time.time()
+        users = load_chat_users()
+        counts = load_pick_counts()
+        assigned = load_assignments_since(started - 2 * 86400)
+    except Exception:
+        logger.exception("roster warm-up failed, who_today will query Postgres")
+        return
+
+    for platform, chat_id, user_id, display_name, ts in users:
+        observe(platform, chat_id, user_id, display_name, ts)
+    with _lock:
+        for platform, chat_id, user_id, n in counts:
+            _picks.setdefault((platform, int(chat_id)), {})[int(user_id)] = int(n)
+        # эти титулы уже посчитаны в counts — только помечаем, без второго +1
+        for platform, chat_id, a_day, user_id, _ts in assigned:
+            if a_day >= day - timedelta(days=1):
+                _mark((platform, int(chat_id)), a_day, int(user_id), count=False)
+    _users_mark = _assigned_mark = started
+    _warm = True
+    logger.info("roster warmed: %d members in %d chats", len(users), len(_rosters))
+
+
+def refresh_from_db(day: date) -> None:
+    """
+    Догнать базу: участники, писавшие через другие воркеры, и выданные ими титулы.
+    Вызывается в потоке (run_db) раз в ROSTER_REFRESH_SEC.
+    """
+    global _users_mark, _assigned_mark
+    if not _warm:
+        warm_from_db(day)
+        return
+
+    from core.chat_store_pg import load_chat_users, load_assignments_since
+
+    users = load_chat_users(since=_users_mark - _REFRESH_OVERLAP_SEC)
+    assigned = load_assignments_since(_assigned_mark - _REFRESH_OVERLAP_SEC)
+
+    for platform, chat_id, user_id, display_name, ts in users:
+        observe(platform, chat_id, user_id, display_name, ts)
+    with _lock:
+        for platform, chat_id, a_day, user_id, _ts in assigned:
+            if a_day >= day - timedelta(days=1):
+                _mark((platform, int(chat_id)), a_day, int(user_id), count=True)
+
+    if users:
+        _users_mark = max(_users_mark, max(row[4] for row in users))
+    if assigned:
+        _assigned_mark = max(_assigned_mark, max(row[4] for row in assigned))
+
+
+async def _refresh_loop(today: Callable[[], date]) -> None:
+    from core.chat_store_pg import run_db
+
+    while True:
+        await asyncio.sleep(ROSTER_REFRESH_SEC)
+        try:
+            await run_db(refresh_from_db, today())
+        except Exception:
+            logger.exception("roster refresh failed")
+
+
+def start_refresh(today: Callable[[], date]) -> None:
+    """Запускается на старте приложения, после warm_from_db (нужен работающий event loop)."""
+    global _task
+    if _task is not None or ROSTER_REFRESH_SEC <= 0:
+        return
+    _task = asyncio.get_running_loop().create_task(_refresh_loop(today))
+
+
+async def stop_refresh() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
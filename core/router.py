@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import inspect
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+from core.executor import run_blocking
+
+
+@dataclass(frozen=True)
+class Message:
+    """Входящее сообщение, нормализованное один раз на входе в роутер."""
+
+    text: str   # как пришло
+    low: str    # text.strip().lower()
+    user_id: int
+    chat_id: int
+    source: str  # "tg" / "vk"
+
+    @classmethod
+    def build(cls, text: str, user_id: int, chat_id: int, source: str) -> "Message":
+        text = text or ""
+        return cls(text=text, low=text.strip().lower(), user_id=user_id, chat_id=chat_id, source=source)
+
+
+@dataclass(frozen=True)
+class MatchSpec:
+    """Дешёвое описание того, на какие сообщения модуль вообще может ответить.
+
+    Все проверки идут по Message.low. Спека может быть шире, чем реальное
+    поведение модуля (обработчик всё равно вправе вернуть None), но не уже.
+    """
+
+    exact: frozenset[str] = frozenset()          # точное совпадение всей строки
+    prefixes: tuple[str, ...] = ()               # строка начинается с ...
+    contains: tuple[str, ...] = ()               # подстрока где угодно
+    patterns: tuple[re.Pattern, ...] = ()        # regex.search
+    any_text: bool = False                       # fallback-модуль: смотрит всё
+
+    def needs_scan(self) -> bool:
+        return bool(self.prefixes or self.contains or self.patterns or self.any_text)
+
+    def scan(self, low: str) -> bool:
+        if self.any_text:
+            return True
+        if self.prefixes and low.startswith(self.prefixes):
+            return True
+        for s in self.contains:
+            if s in low:
+                return True
+        for p in self.patterns:
+            if p.search(low):
+                return True
+        return False
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    spec: MatchSpec
+    handler: Callable[[Message], Any]
+    # True -> обработчик делает блокирующий I/O и запускается в пуле потоков
+    blocking: bool = False
+
+
+class Router:
+    """Диспетчер: по спекам выбирает модули-кандидаты и вызывает только их.
+
+    Порядок маршрутов = приоритет (как раньше в цепочке build_reply_actions):
+    если кандидатов несколько, первым спрашивается тот, кто выше в списке,
+    и отвечает первый, вернувший непустой результат.
+    """
+
+    def __init__(self, routes: Iterable[Route]):
+        self._routes = list(routes)
+
+        # точные команды -> индексы маршрутов: O(1) вне зависимости от числа модулей
+        self._exact: dict[str, list[int]] = {}
+        # маршруты, которым нужна проверка префиксов/подстрок/regex
+        self._scan: list[int] = []
+
+        for i, r in enumerate(self._routes):
+            for cmd in r.spec.exact:
+                self._exact.setdefault(cmd, []).append(i)
+            if r.spec.needs_scan():
+                self._scan.append(i)
+
+    def candidates(self, low: str) -> list[Route]:
+        hit = set(self._exact.get(low, ()))
+        for i in self._scan:
+            if i not in hit and self._routes[i].spec.scan(low):
+                hit.add(i)
+        return [self._routes[i] for i in sorted(hit)]
+
+    async def dispatch(self, msg: Message):
+        for route in self.candidates(msg.low):
+            if route.blocking:
+                result = await run_blocking(route.handler, msg)
+            else:
+                result = route.handler(msg)
+                if inspect.isawaitable(result):
+                    result = await result
+            if result:
+                return result
+        return None
@@ -0,0 +1,289 @@
+import asyncio
+import itertools
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass, field
+
+from adapters.tg_sender import send_text_tg
+from adapters.vk_sender import send_text_vk
+from core.chat_store_pg import (
+    broadcast_progress,
+    broadcast_targets,
+    claim_broadcasts,
+    create_broadcast,
+    finish_broadcast,
+    heartbeat_broadcast,
+    mark_broadcast_target,
+    release_broadcasts,
+    run_db,
+)
+from core.executor import run_send
+from settings import BROADCAST_LEASE_SEC, BROADCAST_MAX_ATTEMPTS, BROADCAST_RATE
+
+logger = logging.getLogger(__name__)
+
+# Рассылки админа (/all, /all_groups, /tg, /vk):
+# - задание и список чатов сохраняются в Postgres, после редеплоя рассылка продолжается;
+# - чаты обходятся с постоянной скоростью BROADCAST_RATE в секунду, без "печатает...";
+# - неудачные отправки повторяются (до BROADCAST_MAX_ATTEMPTS попыток на чат);
+# - прогресс смотрим командой /broadcast_status (из базы — его видно из любого воркера).
+#
+# Gunicorn-воркеров несколько, а у Telegram нет дедупликации по random_id, поэтому
+# рассылку ведёт ровно один воркер — владелец в broadcast_jobs.owner. Владелец
+# продлевает heartbeat; задание без владельца или с устаревшим heartbeat
+# (воркер остановлен или умер) забирает другой воркер при очередной проверке.
+
+# кто мы в broadcast_jobs.owner
+_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+_HEARTBEAT_SEC = BROADCAST_LEASE_SEC / 3
+
+
+@dataclass
+class BroadcastJob:
+    id: int
+    text: str
+    total: int
+    sent: int = 0
+    failed: int = 0
+    status: str = "running"   # running / done / lost (забрал другой воркер)
+    persisted: bool = True     # False — Postgres недоступен, после рестарта не продолжится
+    started_at: float = field(default_factory=time.time)
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.sent - self.failed
+
+
+# задания этого воркера: идущие + несохранённые в базу (их прогресс есть только здесь);
+# сохранённые после завершения убираются — /broadcast_status читает их из базы
+_jobs: dict[int, BroadcastJob] = {}
+_tasks: dict[int, asyncio.Task] = {}
+# запуски рассылок до _spawn (ссылки держим, иначе задачу может собрать GC)
+_starting: set[asyncio.Task] = set()
+# сколько завершённых несохранённых заданий помнить для /broadcast_status
+_LOCAL_KEEP = 20
+_claim_task: asyncio.Task | None = None
+# остановка воркера: рассылки выходят между чатами, текущая отправка доходит и записывается
+_stopping = False
+# сколько ждать, пока рассылки дошлют текущий чат и остановятся
+_STOP_TIMEOUT_SEC = 15.0
+# id для заданий, которые не удалось сохранить в базу (отрицательные, чтобы не пересекаться)
+_local_ids = itertools.count(-1, -1)
+
+
+def _random_id(job_id: int, chat_id: int) -> int:
+    # стабильный random_id VK для пары (рассылка, чат): повтор не создаст дубль
+    return (abs(job_id) * 1_000_003 + abs(int(chat_id))) % 2_000_000_000 + 1
+
+
+def _send_one(platform: str, chat_id: int, text: str, job_id: int) -> bool:
+    try:
+        if platform == "tg":
+            return send_text_tg(chat_id, text)
+        if platform == "vk":
+            return send_text_vk(chat_id, text, _random_id(job_id, chat_id))
+    except Exception:
+        logger.exception("broadcast %s: send to %s:%s failed", job_id, platform, chat_id)
+    return False
+
+
+async def _still_owner(job: BroadcastJob) -> bool:
+    try:
+        owned = await run_db(heartbeat_broadcast, job.id, _OWNER)
+    except Exception:
+        # база недоступна — забрать задание сейчас не может и никто другой
+        logger.exception("broadcast %s: heartbeat failed", job.id)
+        return True
+    if not owned:
+        logger.warning("broadcast %s: taken over by another worker, stopping here", job.id)
+        job.status = "lost"
+    return owned
+
+
+async def _save(job: BroadcastJob, fn, *args) -> None:
+    if not job.persisted:
+        return
+    try:
+        await run_db(fn, *args)
+    except Exception:
+        # прогресс в базе не критичен для самой отправки
+        logger.exception("broadcast %s: failed to save progress", job.id)
+
+
+async def _run(job: BroadcastJob, todo: list[tuple[str, int, int]]) -> None:
+    """todo: [(platform, chat_id, attempts_done), ...]"""
+    interval = 1.0 / BROADCAST_RATE if BROADCAST_RATE > 0 else 0.0
+    last_beat = time.monotonic()
+
+    while todo:
+        retry: list[tuple[str, int, int]] = []
+        for platform, chat_id, attempts in todo:
+            if _stopping:
+                return
+            started = time.monotonic()
+            if job.persisted and started - last_beat >= _HEARTBEAT_SEC:
+                if not await _still_owner(job):
+                    return
+                last_beat = started
+            ok = await run_send(_send_one, platform, chat_id, job.text, job.id)
+            attempts += 1
+
+            if ok:
+                job.sent += 1
+                await _save(job, mark_broadcast_target, job.id, platform, chat_id, "sent", attempts)
+            elif attempts >= BROADCAST_MAX_ATTEMPTS:
+                job.failed += 1
+                await _save(job, mark_broadcast_target, job.id, platform, chat_id, "failed", attempts)
+            else:
+                retry.append((platform, chat_id, attempts))
+                await _save(job, mark_broadcast_target, job.id, platform, chat_id, "pending", attempts)
+
+            # темп рассылки
+            spent = time.monotonic() - started
+            if interval > spent:
+                await asyncio.sleep(interval - spent)
+
+        todo = retry
+
+    job.status = "done"
+    await _save(job, finish_broadcast, job.id)
+
+
+def _finished(job: BroadcastJob) -> None:
+    _tasks.pop(job.id, None)
+    if job.persisted:
+        _jobs.pop(job.id, None)
+        return
+    local = sorted((j for j in _jobs.values() if not j.persisted and j.id not in _tasks), key=lambda j: j.started_at)
+    for old in local[:-_LOCAL_KEEP]:
+        _jobs.pop(old.id, None)
+
+
+def _spawn(job: BroadcastJob, todo: list[tuple[str, int, int]]) -> None:
+    _jobs[job.id] = job
+    task = asyncio.get_running_loop().create_task(_run(job, todo))
+    _tasks[job.id] = task
+    task.add_done_callback(lambda _t, j=job: _finished(j))
+
+
+async def _start(targets: list[tuple[str, int]], text: str) -> None:
+    try:
+        job_id = await run_db(create_broadcast, text, targets, _OWNER)
+        persisted = True
+    except Exception:
+        logger.exception("broadcast: failed to persist job, running without resume")
+        job_id = next(_local_ids)
+        persisted = False
+
+    job = BroadcastJob(id=job_id, text=text, total=len(targets), persisted=persisted)
+    _spawn(job, [(p, int(c), 0) for p, c in targets])
+
+
+def start_broadcast(targets: list[tuple[str, int]], text: str) -> None:
+    """Запустить рассылку в фоне (вызывать из event loop). targets уже без дублей."""
+    task = asyncio.get_running_loop().create_task(_start(targets, text))
+    _starting.add(task)
+    task.add_done_callback(_starting.discard)
+
+
+async def _claim_and_resume() -> None:
+    """Забираем бесхозные рассылки и продолжаем их с того места, где остановились."""
+    for job_id, text in await run_db(claim_broadcasts, _OWNER, BROADCAST_LEASE_SEC):
+        if job_id in _tasks:
+            continue
+        rows = await run_db(broadcast_targets, job_id)
+        job = BroadcastJob(
+            id=job_id,
+            text=text,
+            total=len(rows),
+            sent=sum(1 for r in rows if r[2] == "sent"),
+            failed=sum(1 for r in rows if r[2] == "failed"),
+        )
+        todo = [(p, c, a) for p, c, s, a in rows if s == "pending"]
+        logger.info("broadcast %s: resuming, %s chats left", job_id, len(todo))
+        _spawn(job, todo)
+
+
+async def _claim_loop() -> None:
+    while True:
+        try:
+            await _claim_and_resume()
+        except Exception:
+            logger.exception("broadcast: failed to claim running jobs")
+        await asyncio.sleep(BROADCAST_LEASE_SEC / 2)
+
+
+async def resume_broadcasts() -> None:
+    """
+    На старте приложения: сразу забираем бесхозные рассылки и дальше периодически
+    проверяем, не осталось ли заданий от остановленных воркеров.
+    """
+    global _claim_task
+    if _claim_task is None:
+        _claim_task = asyncio.get_running_loop().create_task(_claim_loop())
+
+
+async def stop_broadcasts() -> None:
+    """
+    При остановке просим свои рассылки выйти между чатами (не отменяем: отменённая
+    посреди run_send отправка дошла бы, а в базе чат остался бы pending, и следующий
+    владелец отправил бы его ещё раз) и отдаём их оставшимся воркерам, не дожидаясь
+    истечения heartbeat.
+    """
+    global _claim_task, _stopping
+    _stopping = True
+    if _claim_task is not None:
+        _claim_task.cancel()
+        _claim_task = None
+
+    owned = {jid: task for jid, task in _tasks.items() if _jobs[jid].persisted}
+    tasks = list(_tasks.values())
+    if not tasks:
+        return
+    _done, stuck = await asyncio.wait(tasks, timeout=_STOP_TIMEOUT_SEC)
+    for t in stuck:
+        # отправка зависла дольше таймаута; такое задание не отдаём — его заберут
+        # после истечения heartbeat, когда поток отправки уже точно закончит
+        t.cancel()
+    released = [jid for jid, task in owned.items() if task not in stuck]
+    if stuck:
+        logger.warning("broadcast: %d job(s) did not stop in time, left to lease expiry", len(stuck))
+
+    try:
+        await run_db(release_broadcasts, released, _OWNER)
+    except Exception:
+        logger.exception("broadcast: failed to release jobs, they will be taken over after the lease")
+
+
+def _status_line(job_id: int, status: str, total: int, sent: int, failed: int, note: str = "") -> str:
+    state = "⏳ идёт" if status == "running" else "✅ завершена"
+    return (
+        f"\n#{job_id} — {state}{note}\n"
+        f"Отправлено: {sent} из {total}, ошибок: {failed}, осталось: {total - sent - failed}"
+    )
+
+
+async def broadcast_status_text(limit: int = 3) -> str:
+    """
+    Прогресс последних рассылок. Счётчики — из broadcast_targets: рассылку может вести
+    другой воркер, в памяти этого её нет. Несохранённые в базу задания — из памяти.
+    """
+    local = [j for j in _jobs.values() if not j.persisted]
+    try:
+        rows = await run_db(broadcast_progress, limit)
+    except Exception:
+        logger.exception("broadcast: failed to read progress")
+        rows = []
+        local = list(_jobs.values())
+
+    lines = [_status_line(*row) for row in rows]
+    for job in sorted(local, key=lambda j: j.started_at, reverse=True)[:limit]:
+        note = "" if job.persisted else " (без сохранения в базе)"
+        status = "running" if job.status == "running" else "done"
+        lines.append(_status_line(job.id, status, job.total, job.sent, job.failed, note))
+
+    if not lines:
+        return "📭 Рассылок пока не было."
+    return "\n".join(["📬 Рассылки:", *lines])
@@ -2,11 +2,24 @@ import asyncio
 import random
 
 from core.actions import OutText
+from core.delivery import submit
+from core.router import MatchSpec
 from core.idle_notifier import get_known_chats, get_group_chats
 from settings import ADMIN_TG_IDS, ADMIN_VK_IDS
 from adapters.tg_sender import send_actions_tg
 from adapters.vk_sender import send_actions_vk
 
+from .broadcast import broadcast_status_text, start_broadcast
+
+# постановки в очередь отправки из _send_to_targets (ссылки держим, иначе задачу может собрать GC)
+_BG_SUBMITS: set[asyncio.Task] = set()
+
+
+def _submit_bg(loop: asyncio.AbstractEventLoop, platform: str, chat_id: int, actions) -> None:
+    task = loop.create_task(submit(platform, chat_id, actions))
+    _BG_SUBMITS.add(task)
+    task.add_done_callback(_BG_SUBMITS.discard)
+
 
 def _parse_admin_ids(raw: str) -> set[int]:
     raw = (raw or "").strip()
@@ -63,14 +76,14 @@ def _send_to_targets(targets: list[tuple[str, int]], text: str) -> tuple[int, in
 
         if plat == "tg":
             if in_loop and loop:
-                loop.create_task(asyncio.to_thread(send_actions_tg, int(chat_id), actions))
+                _submit_bg(loop, "tg", int(chat_id), actions)
             else:
                 send_actions_tg(int(chat_id), actions)
             sent_tg += 1
 
         elif plat == "vk":
             if in_loop and loop:
-                loop.create_task(asyncio.to_thread(send_actions_vk, int(chat_id), actions))
+                _submit_bg(loop, "vk", int(chat_id), actions)
             else:
                 send_actions_vk(int(chat_id), actions)
             sent_vk += 1
@@ -78,6 +91,27 @@ def _send_to_targets(targets: list[tuple[str, int]], text: str) -> tuple[int, in
     return sent_vk, sent_tg
 
 
+def _broadcast(targets: list[tuple[str, int]], text: str) -> tuple[int, int]:
+    """
+    Массовая рассылка через фоновое задание (темп, повторы, продолжение после редеплоя).
+    Если вдруг нет event loop — по-старому, через _send_to_targets.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _send_to_targets(targets, text)
+
+    unique = list(dict.fromkeys((plat, int(chat_id)) for plat, chat_id in targets if plat in ("tg", "vk")))
+    start_broadcast(unique, text)
+
+    sent_vk = sum(1 for plat, _ in unique if plat == "vk")
+    return sent_vk, len(unique) - sent_vk
+
+
+# Все команды (и шутливый отказ не-админу) начинаются с "/"
+MATCH_SPEC = MatchSpec(prefixes=("/",))
+
+
 NON_ADMIN_COMMAND_REPLIES = [
     "😄 Ахах! Хитрый ход, но нет — командовать собой я не дам.",
     "😏 Неплохая попытка, но эти команды только для админа.",
@@ -87,6 +121,10 @@ NON_ADMIN_COMMAND_REPLIES = [
 ]
 
 
+async def _broadcast_status() -> OutText:
+    return OutText(await broadcast_status_text())
+
+
 def handle_admin_command(platform: str, from_id: int, text: str):
     if not text:
         return None
@@ -109,6 +147,7 @@ def handle_admin_command(platform: str, from_id: int, text: str):
             "/all_groups <текст> — только группы/беседы\n"
             "/tg <текст> — только Telegram\n"
             "/vk <текст> — только VK\n"
+            "/broadcast_status — прогресс рассылок\n"
             "\n"
             "/tg_<chat_id> <текст> — в конкретный TG чат\n"
             "/vk_<peer_id> <текст> — в конкретный VK чат\n"
@@ -116,6 +155,10 @@ def handle_admin_command(platform: str, from_id: int, text: str):
             "/vk_user_<user_id> <текст> — пользователю VK\n"
         )
 
+    # прогресс рассылок (читается из Postgres — отдаём корутину, её дождётся engine)
+    if t == "/broadcast_status":
+        return _broadcast_status()
+
     # должна быть команда + текст
     if " " not in t:
         return None
@@ -127,26 +170,28 @@ def handle_admin_command(platform: str, from_id: int, text: str):
 
     # ---------- массовые рассылки ----------
     if cmd == "/all":
-        vk, tg = _send_to_targets(get_known_chats(), msg)
+        vk, tg = _broadcast(get_known_chats(), msg)
         return OutText(
-            "✅ Отправлено во все чаты.\n"
-            f"VK: {vk}\nTG: {tg}\nВсего: {vk + tg}"
+            "✅ Рассылка во все чаты запущена.\n"
+            f"VK: {vk}\nTG: {tg}\nВсего: {vk + tg}\n"
+            "Прогресс: /broadcast_status"
         )
 
     if cmd == "/all_groups":
-        vk, tg = _send_to_targets(get_group_chats(), msg)
+        vk, tg = _broadcast(get_group_chats(), msg)
         return OutText(
-            "✅ Отправлено только в группы/беседы.\n"
-            f"VK: {vk}\nTG: {tg}\nВсего: {vk + tg}"
+            "✅ Рассылка только в группы/беседы запущена.\n"
+            f"VK: {vk}\nTG: {tg}\nВсего: {vk + tg}\n"
+            "Прогресс: /broadcast_status"
         )
 
     if cmd == "/tg":
-        _, tg = _send_to_targets(get_known_chats("tg"), msg)
-        return OutText(f"✅ Отправлено в Telegram чаты: {tg}")
+        _, tg = _broadcast(get_known_chats("tg"), msg)
+        return OutText(f"✅ Рассылка в Telegram чаты запущена: {tg}\nПрогресс: /broadcast_status")
 
     if cmd == "/vk":
-        vk, _ = _send_to_targets(get_known_chats("vk"), msg)
-        return OutText(f"✅ Отправлено в VK чаты: {vk}")
+        vk, _ = _broadcast(get_known_chats("vk"), msg)
+        return OutText(f"✅ Рассылка в VK чаты запущена: {vk}\nПрогресс: /broadcast_status")
 
     # ---------- пользователи (ВАЖНО: раньше чем /tg_ и /vk_) ----------
     if cmd.startswith("/tg_user_"):
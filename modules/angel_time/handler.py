@@ -1,13 +1,22 @@
 import re
 import random
-from datetime import datetime, timedelta
+from datetime import datetime
+from pathlib import Path
 from zoneinfo import ZoneInfo
 
 from core.actions import OutText
+from core.file_cache import load_cached
+from core.router import MatchSpec
+
+MEANINGS_FILE = str(Path(__file__).resolve().parent / "times.txt")
+MINUTES_PER_DAY = 24 * 60
 
 # Строго HH:MM
 _TIME_RE = re.compile(r"^(?:[01]\d|2[0-3]):[0-5]\d$")
 
+# Всё, что похоже на время (11:11, 11.11, 11-11, 1:1) — верное или с ошибкой формата
+_TIME_LIKE_RE = re.compile(r"^\d{1,2}[.\-:]\d{1,2}$")
+
 # Фразы для НЕ админской статистики/обычных людей — тут не нужно,
 # это отдельная фича, поэтому только для ангельского времени:
 
@@ -37,18 +46,20 @@ MY_STATS_TRIGGERS = {
     "/my_angel_time",
 }
 
+MATCH_SPEC = MatchSpec(exact=frozenset(MY_STATS_TRIGGERS), patterns=(_TIME_LIKE_RE,))
+
 
 def _now_dt(tz_name: str) -> datetime:
     return datetime.now(ZoneInfo(tz_name))
 
 
-def _load_meanings() -> dict[str, str]:
+def _parse_meanings(path: str) -> tuple[str | None, ...]:
     """
     Читает modules/angel_time/times.txt
     Формат: HH:MM|Текст
+    Результат — 1440 ячеек по минуте суток (None, если у времени нет значения).
     """
-    path = "modules/angel_time/times.txt"
-    meanings: dict[str, str] = {}
+    slots: list[str | None] = [None] * MINUTES_PER_DAY
 
     try:
         with open(path, "r", encoding="utf-8") as f:
@@ -62,33 +73,31 @@ def _load_meanings() -> dict[str, str]:
                 k = k.strip()
                 v = v.strip()
                 if _TIME_RE.match(k) and v:
-                    meanings[k] = v
+                    slots[_minute_of_day(k)] = v
     except FileNotFoundError:
-        return {}
+        pass
+
+    return tuple(slots)
 
-    return meanings
 
+def _meanings() -> tuple[str | None, ...]:
+    # файл разбирается один раз и перечитывается, только если поменялся
+    return load_cached(MEANINGS_FILE, _parse_meanings)
 
-def _is_time_close(user_time: str, now: datetime, tolerance_minutes_after: int = 1) -> bool:
+
+def _minute_of_day(hh_mm: str) -> int:
+    """'11:11' -> 671 (строка уже проверена _TIME_RE)."""
+    return int(hh_mm[:2]) * 60 + int(hh_mm[3:])
+
+
+def _is_time_close(user_minute: int, now_minute: int, tolerance_minutes_after: int = 1) -> bool:
     """
     Засчитываем:
     - если сейчас ровно HH:MM
-    - или если сейчас на 1 минуту позже (например 11:12 за 11:11)
+    - или если сейчас не больше чем на tolerance минут позже (например 11:12 за 11:11);
+      через полночь тоже: 00:03 засчитывается за 23:59
     """
-    try:
-        hh, mm = user_time.split(":")
-        base = now.replace(hour=int(hh), minute=int(mm), second=0, microsecond=0)
-    except Exception:
-        return False
-
-    if now.strftime("%H:%M") == base.strftime("%H:%M"):
-        return True
-
-    for i in range(1, tolerance_minutes_after + 1):
-        if now.strftime("%H:%M") == (base + timedelta(minutes=i)).strftime("%H:%M"):
-            return True
-
-    return False
+    return (now_minute - user_minute) % MINUTES_PER_DAY <= tolerance_minutes_after
 
 
 # ---- Статистика через Postgres (если подключено) ----
@@ -97,10 +106,12 @@ def _pg_getters():
     """
     Аккуратно пробуем подключить функции из Postgres.
     Если Postgres не настроен — вернём None и модуль не упадёт.
+    Таблицы создаются миграциями на старте приложения.
     """
     try:
-        from core.chat_store_pg import init_angel_time_stats, log_angel_time, get_user_angel_stats  # noqa
-        return init_angel_time_stats, log_angel_time, get_user_angel_stats
+        from core.activity_buffer import buffer_angel_hit  # noqa
+        from core.chat_store_pg import get_user_angel_stats  # noqa
+        return buffer_angel_hit, get_user_angel_stats
     except Exception:
         return None
 
@@ -132,13 +143,7 @@ def get_angel_time_reply(
         if not pg:
             return [OutText("📊 Статистика пока недоступна (Postgres не подключен).")]
 
-        init_stats, _log, get_stats = pg
-        # Таблица создаётся, если её нет
-        try:
-            init_stats()
-        except Exception:
-            return [OutText("📊 Не получилось открыть статистику (ошибка базы).")]
-
+        _log, get_stats = pg
         try:
             total, top = get_stats(platform, chat_id, user_id, limit=5)
         except Exception:
@@ -155,7 +160,7 @@ def get_angel_time_reply(
 
     # 2) Неверный формат, но похоже на время (11.11, 11-11, 11:1 и т.п.)
     # Требование: принимаем ТОЛЬКО 11:11. Остальное — ошибка формата.
-    if re.match(r"^\d{1,2}[.\-:]\d{1,2}$", t) and not _TIME_RE.match(t):
+    if _TIME_LIKE_RE.match(t) and not _TIME_RE.match(t):
         return [OutText(random.choice(FORMAT_ERROR_REPLIES))]
 
     # 3) Если не строго HH:MM — не реагируем (пусть другие модули отвечают)
@@ -163,30 +168,26 @@ def get_angel_time_reply(
         return None
 
     now = _now_dt(tz_name)
-    now_str = now.strftime("%H:%M")
+    user_minute = _minute_of_day(t)
 
     # 4) Если сейчас другое время (и не попали в +9 минуту)
-    if not _is_time_close(t, now, tolerance_minutes_after=9):
-        reply = random.choice(OTHER_TIME_REPLIES).format(now=now_str)
+    if not _is_time_close(user_minute, now.hour * 60 + now.minute, tolerance_minutes_after=9):
+        reply = random.choice(OTHER_TIME_REPLIES).format(now=now.strftime("%H:%M"))
         return [OutText(reply)]
 
-    # 5) Сейчас совпало (или +1 мин) -> ищем значение
-    meanings = _load_meanings()
+    # 5) Сейчас совпало (или +9 мин) -> ищем значение
+    meaning = _meanings()[user_minute]
 
-    if t in meanings:
+    if meaning:
         # Логируем статистику, только если подключен Postgres
+        # (в буфер; в БД уйдёт пачкой при следующем сбросе)
         pg = _pg_getters()
         if pg:
-            init_stats, log_time, _get_stats = pg
-            try:
-                init_stats()
-                log_time(platform, chat_id, user_id, t)
-            except Exception:
-                # статистика не критична, не ломаем ответ
-                pass
+            log_time, _get_stats = pg
+            log_time(platform, chat_id, user_id, t)
 
         hint = "\n\n📊 Хочешь свою статистику? Напиши: Мое ангельское время или введи команду /my_angel_time"
-        return [OutText(meanings[t] + hint)]
+        return [OutText(meaning + hint)]
 
     # 6) Значения нет, но время совпало
     return [OutText(random.choice(NO_MEANING_REPLIES))]
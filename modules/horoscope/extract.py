@@ -0,0 +1,134 @@
+from html.parser import HTMLParser
+
+# Быстрое извлечение текста из div.entry-content страницы abc-moon.ru.
+#
+# Раньше страница целиком разбиралась BeautifulSoup (html.parser) в дерево,
+# чтобы взять один div. Здесь — потоковый парсер на стандартном html.parser:
+# дерево не строится, ссылки/скрипты пропускаются, а после закрытия
+# entry-content разбор страницы прекращается (хвост с меню/футером не читаем).
+# Результат совпадает с "\n\n".join(section.stripped_strings) после удаления <a>.
+
+_SKIP_TAGS = {"a", "script", "style", "template"}
+_CHUNK = 16 * 1024
+
+
+class _EntryContentParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.found = False
+        self.done = False
+        self.parts: list[str] = []
+        self._depth = 0   # вложенность div внутри entry-content
+        self._skip = 0    # внутри <a>/<script>/...
+        self._buf: list[str] = []
+
+    def _flush(self) -> None:
+        # один текстовый узел может прийти несколькими кусками — склеиваем до границы тега
+        if self._buf:
+            s = "".join(self._buf).strip()
+            self._buf = []
+            if s:
+                self.parts.append(s)
+
+    def handle_starttag(self, tag, attrs):
+        if self.done:
+            return
+        if not self.found:
+            if tag == "div":
+                classes = (dict(attrs).get("class") or "").split()
+                if "entry-content" in classes:
+                    self.found = True
+                    self._depth = 1
+            return
+
+        self._flush()
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag == "div":
+            self._depth += 1
+
+    def handle_startendtag(self, tag, attrs):
+        # <br/>, <img/> и т.п. — только граница текста
+        if self.found and not self.done:
+            self._flush()
+
+    def handle_endtag(self, tag):
+        if not self.found or self.done:
+            return
+
+        self._flush()
+        if tag in _SKIP_TAGS:
+            if self._skip:
+                self._skip -= 1
+        elif tag == "div":
+            self._depth -= 1
+            if self._depth == 0:
+                self.done = True
+
+    def handle_data(self, data):
+        if self.found and not self.done and not self._skip:
+            self._buf.append(data)
+
+    def handle_comment(self, data):
+        if self.found and not self.done:
+            self._flush()
+
+
+def extract_entry_text(html: str) -> str | None:
+    """Текст div.entry-content (абзацы через пустую строку) или None, если блока нет."""
+    p = _EntryContentParser()
+    for i in range(0, len(html), _CHUNK):
+        p.feed(html[i:i + _CHUNK])
+        if p.done:
+            break
+    else:
+        p.close()
+    p._flush()
+
+    if not p.found:
+        return None
+    return "\n\n".join(p.parts)
+
+
+def extract_entry_text_bs4(html: str) -> str | None:
+    """Прежний способ через BeautifulSoup — запасной вариант и эталон для сравнения."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "html.parser")
+    section = soup.find("div", class_="entry-content")
+    if not section:
+        return None
+
+    # удаляем ссылки, чтобы не было мусора
+    for a in section.find_all("a"):
+        a.decompose()
+
+    return "\n\n".join(section.stripped_strings)
+
+
+if __name__ == "__main__":
+    # Сравнение с BeautifulSoup (результат и скорость):
+    #   python -m modules.horoscope.extract                      — страницы из fixtures/
+    #   python -m modules.horoscope.extract saved/lev.html ...   — свои сохранённые страницы
+    # fixtures/ — страницы в разметке abc-moon.ru (WordPress): меню, entry-content со ссылками,
+    # <br>, сущностями, вложенными div и скриптами, длинный сайдбар после блока; no_entry.html — без блока.
+    import sys
+    import timeit
+    from pathlib import Path
+
+    paths = sys.argv[1:] or sorted(str(p) for p in (Path(__file__).parent / "fixtures").glob("*.html"))
+
+    different = 0
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            page = f.read()
+
+        fast = extract_entry_text(page)
+        ref = extract_entry_text_bs4(page)
+        n = 20
+        t_fast = timeit.timeit(lambda: extract_entry_text(page), number=n) / n
+        t_ref = timeit.timeit(lambda: extract_entry_text_bs4(page), number=n) / n
+        same = "equal" if fast == ref else "DIFFERENT"
+        different += fast != ref
+        print(f"{path}: stream={t_fast * 1000:.2f} ms  bs4={t_ref * 1000:.2f} ms  output {same}")
+    sys.exit(1 if different else 0)
@@ -1,12 +1,20 @@
+import asyncio
+import logging
 import re
+import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 
 import requests
-from bs4 import BeautifulSoup
 
 from core.actions import OutText
+from core.executor import run_blocking
+from core.router import MatchSpec
+from .extract import extract_entry_text, extract_entry_text_bs4
+from settings import HOROSCOPE_PREFETCH_AT, HOROSCOPE_FETCH_CONCURRENCY
+
+logger = logging.getLogger(__name__)
 
 TZ_NAME = "Europe/Moscow"
 
@@ -61,6 +69,9 @@ SIGN_RE = re.compile(
     re.IGNORECASE,
 )
 
+# Слово "гороскоп" или знак (знак без слова — только если ждём ответ, это решает обработчик)
+MATCH_SPEC = MatchSpec(patterns=(HORO_WORD_RE, SIGN_RE))
+
 ASK_TEXT = (
     "🔮 Хочешь гороскоп? Напиши, для какого знака.\n"
     "Я всех не упомню 🙂\n\n"
@@ -114,41 +125,36 @@ def _extract_sign(text: str) -> str | None:
     return FORM_TO_SIGN.get(form)
 
 
-def _get_horoscope_from_website(sign_ru: str) -> str:
+def _fetch_horoscope(sign_ru: str) -> str:
     """
     Тянем с abc-moon.ru/goroskop/<slug>/
     Достаём текст из div.entry-content
+    Бросает RuntimeError, если сайт недоступен или текст не найден.
     """
     slug = SIGN_SLUGS[sign_ru]
     url = f"http://www.abc-moon.ru/goroskop/{slug}/"
 
-    try:
-        r = requests.get(
-            url,
-            timeout=15,
-            headers={
-                "User-Agent": "Mozilla/5.0 (compatible; CrabBroBot/1.0)",
-                "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
-            },
-        )
-    except Exception:
-        return "😕 Не получилось получить гороскоп с сайта сейчас. Попробуй чуть позже."
-
+    r = requests.get(
+        url,
+        timeout=15,
+        headers={
+            "User-Agent": "Mozilla/5.0 (compatible; CrabBroBot/1.0)",
+            "Accept-Language": "ru-RU,ru;q=0.9,en;q=0.8",
+        },
+    )
     if r.status_code != 200:
-        return "😕 Не получилось получить гороскоп с сайта сейчас. Попробуй чуть позже."
-
-    soup = BeautifulSoup(r.text, "html.parser")
-    section = soup.find("div", class_="entry-content")
-    if not section:
-        return "😕 Я не нашла текст гороскопа на странице."
+        raise RuntimeError(f"abc-moon.ru returned {r.status_code} for {slug}")
 
-    # удаляем ссылки, чтобы не было мусора
-    for a in section.find_all("a"):
-        a.decompose()
+    text = extract_entry_text(r.text)
+    if text is None:
+        # потоковый разбор не нашёл блок (странная вёрстка) — пробуем полным разбором
+        text = extract_entry_text_bs4(r.text)
+    if text is None:
+        raise RuntimeError(f"no entry-content on page for {slug}")
 
-    text = "\n\n".join(section.stripped_strings).strip()
+    text = text.strip()
     if not text:
-        return "😕 Я не нашла текст гороскопа на странице."
+        raise RuntimeError(f"empty entry-content on page for {slug}")
 
     # Можно отрезать вводные, начиная с "Гороскоп"
     idx = text.lower().find("гороскоп")
@@ -158,7 +164,147 @@ def _get_horoscope_from_website(sign_ru: str) -> str:
     return text
 
 
-def get_horoscope_reply(text: str, platform: str, chat_id: int, user_id: int):
+# ---- кеш: знак -> (дата по Москве, текст) ----
+# Гороскоп на сайте меняется раз в день, поэтому сайт дёргаем не чаще раза в день на знак.
+_CACHE: dict[str, tuple[str, str]] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def _today_key() -> str:
+    return _now_msk().date().isoformat()
+
+
+def _refresh(sign_ru: str) -> str:
+    """Скачать свежий текст и положить в кеш (бросает исключение при ошибке)."""
+    text = _fetch_horoscope(sign_ru)
+    with _CACHE_LOCK:
+        _CACHE[sign_ru] = (_today_key(), text)
+    return text
+
+
+# ---- запросы к сайту из event loop ----
+# Одновременно по одному знаку идёт не больше одного скачивания: 20 одновременных
+# "гороскоп лев" ждут один и тот же запрос. Всего скачиваний параллельно —
+# не больше HOROSCOPE_FETCH_CONCURRENCY, и все они в пуле потоков, а не в event loop.
+_inflight: dict[str, asyncio.Future] = {}
+_fetch_slots: asyncio.Semaphore | None = None
+
+
+async def _refresh_coalesced(sign_ru: str) -> str:
+    fut = _inflight.get(sign_ru)
+    if fut is not None:
+        return await asyncio.shield(fut)
+
+    global _fetch_slots
+    if _fetch_slots is None:
+        _fetch_slots = asyncio.Semaphore(HOROSCOPE_FETCH_CONCURRENCY)
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[sign_ru] = fut
+    try:
+        async with _fetch_slots:
+            text = await run_blocking(_refresh, sign_ru)
+        fut.set_result(text)
+    except BaseException as e:
+        fut.set_exception(e)
+        # исключение забирают ожидающие; чтобы asyncio не ругался, если их нет
+        fut.exception()
+        raise
+    finally:
+        _inflight.pop(sign_ru, None)
+    return text
+
+
+# фоновые обновления устаревших знаков (ссылки держим, чтобы задачи не собрал GC)
+_revalidating: set[asyncio.Task] = set()
+
+
+async def _revalidate(sign_ru: str) -> None:
+    try:
+        await _refresh_coalesced(sign_ru)
+    except Exception:
+        logger.warning("horoscope background refresh failed for %s", sign_ru, exc_info=True)
+
+
+def _start_revalidate(sign_ru: str) -> None:
+    if sign_ru in _inflight:
+        return
+    task = asyncio.get_running_loop().create_task(_revalidate(sign_ru))
+    _revalidating.add(task)
+    task.add_done_callback(_revalidating.discard)
+
+
+async def _get_horoscope_text(sign_ru: str) -> str:
+    """
+    Текст гороскопа для знака (stale-while-revalidate):
+    - есть в кеше за сегодня (МСК) -> сразу из памяти;
+    - есть только за прошлый день -> сразу его же, а свежий качаем в фоне
+      (одно скачивание на знак) — пользователь сеть не ждёт;
+    - в кеше нет ничего -> качаем и ждём; сайт недоступен -> извиняемся.
+    """
+    with _CACHE_LOCK:
+        cached = _CACHE.get(sign_ru)
+    if cached:
+        if cached[0] != _today_key():
+            _start_revalidate(sign_ru)
+        return cached[1]
+
+    try:
+        return await _refresh_coalesced(sign_ru)
+    except Exception:
+        logger.warning("horoscope fetch failed for %s", sign_ru, exc_info=True)
+    return "😕 Не получилось получить гороскоп с сайта сейчас. Попробуй чуть позже."
+
+
+# ---- фоновая предзагрузка всех знаков после полуночи МСК ----
+_prefetch_task: asyncio.Task | None = None
+
+
+def _seconds_until_prefetch() -> float:
+    now = _now_msk()
+    hh, mm = (int(x) for x in HOROSCOPE_PREFETCH_AT.split(":", 1))
+    target = now.replace(hour=hh, minute=mm, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+async def prefetch_all() -> None:
+    """Обновить кеш по всем 12 знакам; ошибки не страшны — останется вчерашний текст."""
+    for sign in SIGN_SLUGS:
+        try:
+            await _refresh_coalesced(sign)
+        except Exception:
+            logger.warning("horoscope prefetch failed for %s", sign, exc_info=True)
+
+
+async def _prefetch_loop() -> None:
+    # сразу после старта прогреваем кеш, дальше — каждый день в HOROSCOPE_PREFETCH_AT
+    await prefetch_all()
+    while True:
+        await asyncio.sleep(_seconds_until_prefetch())
+        await prefetch_all()
+
+
+def start_prefetch() -> None:
+    """Запускается на старте приложения (нужен работающий event loop)."""
+    global _prefetch_task
+    if _prefetch_task is None:
+        _prefetch_task = asyncio.get_running_loop().create_task(_prefetch_loop())
+
+
+async def stop_prefetch() -> None:
+    global _prefetch_task
+    if _prefetch_task is not None:
+        _prefetch_task.cancel()
+        try:
+            await _prefetch_task
+        except asyncio.CancelledError:
+            pass
+        _prefetch_task = None
+
+
+async def get_horoscope_reply(text: str, platform: str, chat_id: int, user_id: int):
     """
     - если есть "гороскоп" и нет знака -> спросить знак + запомнить ожидание
     - если есть "гороскоп" и есть знак -> вернуть гороскоп
@@ -182,13 +328,13 @@ def get_horoscope_reply(text: str, platform: str, chat_id: int, user_id: int):
     if sign and _is_waiting(platform, chat_id, user_id):
         _clear_waiting(platform, chat_id, user_id)
         date_str = _now_msk().strftime("%d.%m.%Y")
-        horo = _get_horoscope_from_website(sign)
+        horo = await _get_horoscope_text(sign)
         return [OutText(f"🔮 {horo}")]
 
     # 3) запрос вида "гороскоп деве"
     if has_horo_word and sign:
         date_str = _now_msk().strftime("%d.%m.%Y")
-        horo = _get_horoscope_from_website(sign)
+        horo = await _get_horoscope_text(sign)
         return [OutText(f"🔮 {horo}")]
 
     return None
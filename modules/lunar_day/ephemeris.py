@@ -0,0 +1,530 @@
+from __future__ import annotations
+
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import numpy as np
+except ImportError:  # без numpy считаем поэлементно через math — медленнее, но результат тот же
+    np = None
+
+from settings import LUNAR_LAT, LUNAR_LON
+
+# Офлайн-эфемериды Луны по Жану Меёсу ("Astronomical Algorithms", 2-е изд.):
+# - истинные фазы (новолуние, четверти, полнолуние) — глава 49, точность ~ минута;
+# - положение Луны — глава 47 (сокращённые ряды, ~0.01°), по нему ищем восходы Луны,
+#   от которых считаются лунные сутки.
+# Всё считается пачкой на целый год (numpy, если установлен) и кешируется на диск.
+
+logger = logging.getLogger(__name__)
+
+CACHE_VERSION = 1
+
+# TT - UTC: ≈ 69 с в 2020-х; ошибка в несколько секунд на минутную точность не влияет
+DELTA_T_SEC = 69.0
+
+# шаг сетки при поиске восходов; внутри шага восход уточняется интерполяцией
+RISE_STEP_DAYS = 10.0 / 1440.0
+
+_JD_UNIX_EPOCH = 2440587.5
+_J2000 = 2451545.0
+
+
+def _jd_from_ts(ts):
+    return ts / 86400.0 + _JD_UNIX_EPOCH
+
+
+def _ts_from_jd(jd):
+    return (jd - _JD_UNIX_EPOCH) * 86400.0
+
+
+class _ScalarMath:
+    """Те же имена функций, что у numpy, но для обычных float (запасной путь без numpy)."""
+
+    sin = staticmethod(math.sin)
+    cos = staticmethod(math.cos)
+    tan = staticmethod(math.tan)
+    arcsin = staticmethod(math.asin)
+    arctan2 = staticmethod(math.atan2)
+    radians = staticmethod(math.radians)
+
+
+def _batch(fn, xs: list[float]) -> list[float]:
+    """fn(x, xp) на каждый элемент: одним векторным вызовом с numpy, иначе в цикле."""
+    if np is not None:
+        return fn(np.asarray(xs, dtype=float), np).tolist()
+    return [fn(x, _ScalarMath) for x in xs]
+
+
+# ---- фазы Луны (глава 49) ----
+# (коэффициент, степень E, множители при M, M', F, Ω) -> coef * E^e * sin(m*M + mp*M' + f*F + o*Ω)
+_PHASE_TAIL = (
+    (-0.00007, 0, 2, 1, 0, 0),
+    (0.00004, 0, 0, 2, -2, 0),
+    (0.00004, 0, 3, 0, 0, 0),
+    (0.00003, 0, 1, 1, -2, 0),
+    (0.00003, 0, 0, 2, 2, 0),
+    (-0.00003, 0, 1, 1, 2, 0),
+    (0.00003, 0, -1, 1, 2, 0),
+    (-0.00002, 0, -1, 1, -2, 0),
+    (-0.00002, 0, 1, 3, 0, 0),
+    (0.00002, 0, 0, 4, 0, 0),
+)
+
+_NEW_MOON_TERMS = (
+    (-0.40720, 0, 0, 1, 0, 0),
+    (0.17241, 1, 1, 0, 0, 0),
+    (0.01608, 0, 0, 2, 0, 0),
+    (0.01039, 0, 0, 0, 2, 0),
+    (0.00739, 1, -1, 1, 0, 0),
+    (-0.00514, 1, 1, 1, 0, 0),
+    (0.00208, 2, 2, 0, 0, 0),
+    (-0.00111, 0, 0, 1, -2, 0),
+    (-0.00057, 0, 0, 1, 2, 0),
+    (0.00056, 1, 1, 2, 0, 0),
+    (-0.00042, 0, 0, 3, 0, 0),
+    (0.00042, 1, 1, 0, 2, 0),
+    (0.00038, 1, 1, 0, -2, 0),
+    (-0.00024, 1, -1, 2, 0, 0),
+    (-0.00017, 0, 0, 0, 0, 1),
+) + _PHASE_TAIL
+
+_FULL_MOON_TERMS = (
+    (-0.40614, 0, 0, 1, 0, 0),
+    (0.17302, 1, 1, 0, 0, 0),
+    (0.01614, 0, 0, 2, 0, 0),
+    (0.01043, 0, 0, 0, 2, 0),
+    (0.00734, 1, -1, 1, 0, 0),
+    (-0.00515, 1, 1, 1, 0, 0),
+    (0.00209, 2, 2, 0, 0, 0),
+    (-0.00111, 0, 0, 1, -2, 0),
+    (-0.00057, 0, 0, 1, 2, 0),
+    (0.00056, 1, 1, 2, 0, 0),
+    (-0.00042, 0, 0, 3, 0, 0),
+    (0.00042, 1, 1, 0, 2, 0),
+    (0.00038, 1, 1, 0, -2, 0),
+    (-0.00024, 1, -1, 2, 0, 0),
+    (-0.00017, 0, 0, 0, 0, 1),
+) + _PHASE_TAIL
+
+_QUARTER_TERMS = (
+    (-0.62801, 0, 0, 1, 0, 0),
+    (0.17172, 1, 1, 0, 0, 0),
+    (-0.01183, 1, 1, 1, 0, 0),
+    (0.00862, 0, 0, 2, 0, 0),
+    (0.00804, 0, 0, 0, 2, 0),
+    (0.00454, 1, -1, 1, 0, 0),
+    (0.00204, 2, 2, 0, 0, 0),
+    (-0.00180, 0, 0, 1, -2, 0),
+    (-0.00070, 0, 0, 1, 2, 0),
+    (-0.00040, 0, 0, 3, 0, 0),
+    (-0.00034, 1, -1, 2, 0, 0),
+    (0.00032, 1, 1, 0, 2, 0),
+    (0.00032, 1, 1, 0, -2, 0),
+    (-0.00028, 2, 2, 1, 0, 0),
+    (0.00027, 1, 1, 2, 0, 0),
+    (-0.00017, 0, 0, 0, 0, 1),
+    (-0.00005, 0, -1, 1, -2, 0),
+    (0.00004, 0, 0, 2, 2, 0),
+    (-0.00004, 0, 1, 1, 2, 0),
+    (0.00004, 0, -2, 1, 0, 0),
+    (0.00003, 0, 1, 1, -2, 0),
+    (0.00003, 0, 3, 0, 0, 0),
+    (0.00002, 0, 0, 2, -2, 0),
+    (0.00002, 0, -1, 1, 2, 0),
+    (-0.00002, 0, 1, 3, 0, 0),
+)
+
+# поправки от планет: (коэффициент, A0, множитель при k)
+_PLANETARY_TERMS = (
+    (0.000325, 299.77, 0.107408),
+    (0.000165, 251.88, 0.016321),
+    (0.000164, 251.83, 26.651886),
+    (0.000126, 349.42, 36.412478),
+    (0.000110, 84.66, 18.206239),
+    (0.000062, 141.74, 53.303771),
+    (0.000060, 207.14, 2.453732),
+    (0.000056, 154.84, 7.306860),
+    (0.000047, 34.52, 27.261239),
+    (0.000042, 207.19, 0.121824),
+    (0.000040, 291.34, 1.844379),
+    (0.000037, 161.72, 24.198154),
+    (0.000035, 239.56, 25.513099),
+    (0.000023, 331.55, 3.592518),
+)
+
+# доля лунного месяца -> ряд поправок
+PHASES = {
+    "new": (0.0, _NEW_MOON_TERMS),
+    "first_quarter": (0.25, _QUARTER_TERMS),
+    "full": (0.5, _FULL_MOON_TERMS),
+    "last_quarter": (0.75, _QUARTER_TERMS),
+}
+
+
+def _phase_jde(k, xp, phase: str):
+    """JDE (TT) истинной фазы с номером k (k=0 — новолуние 6 января 2000)."""
+    _, terms = PHASES[phase]
+    rad = xp.radians
+    T = k / 1236.85
+    T2 = T * T
+
+    jde = 2451550.09766 + 29.530588861 * k + 0.00015437 * T2 - 0.000000150 * T2 * T + 0.00000000073 * T2 * T2
+    E = 1.0 - 0.002516 * T - 0.0000074 * T2
+    M = rad((2.5534 + 29.10535670 * k - 0.0000014 * T2 - 0.00000011 * T2 * T) % 360.0)
+    Mp = rad((201.5643 + 385.81693528 * k + 0.0107582 * T2 + 0.00001238 * T2 * T - 0.000000058 * T2 * T2) % 360.0)
+    F = rad((160.7108 + 390.67050284 * k - 0.0016118 * T2 - 0.00000227 * T2 * T + 0.000000011 * T2 * T2) % 360.0)
+    Om = rad((124.7746 - 1.56375588 * k + 0.0020672 * T2 + 0.00000215 * T2 * T) % 360.0)
+
+    for coef, e_pow, m, mp, f, o in terms:
+        jde = jde + coef * E ** e_pow * xp.sin(m * M + mp * Mp + f * F + o * Om)
+
+    if phase in ("first_quarter", "last_quarter"):
+        W = (
+            0.00306 - 0.00038 * E * xp.cos(M) + 0.00026 * xp.cos(Mp)
+            - 0.00002 * xp.cos(Mp - M) + 0.00002 * xp.cos(Mp + M) + 0.00002 * xp.cos(2 * F)
+        )
+        jde = jde + W if phase == "first_quarter" else jde - W
+
+    for i, (coef, a0, rate) in enumerate(_PLANETARY_TERMS):
+        a = a0 + rate * k
+        if i == 0:
+            a = a - 0.009173 * T2
+        jde = jde + coef * xp.sin(rad(a % 360.0))
+    return jde
+
+
+def phase_times(phase: str, start_ts: float, end_ts: float) -> list[float]:
+    """Моменты фазы (UTC timestamp) в [start_ts, end_ts)."""
+    offset, _ = PHASES[phase]
+    k0 = math.floor((_jd_from_ts(start_ts) - 2451550.09766) / 29.530588861) - 1
+    k1 = math.ceil((_jd_from_ts(end_ts) - 2451550.09766) / 29.530588861) + 1
+    ks = [k + offset for k in range(k0, k1 + 1)]
+    jdes = _batch(lambda k, xp: _phase_jde(k, xp, phase), ks)
+    out = [_ts_from_jd(jde) - DELTA_T_SEC for jde in jdes]
+    return [t for t in out if start_ts <= t < end_ts]
+
+
+# ---- положение Луны (глава 47, сокращённые ряды) ----
+# (D, M, M', F, Σl в 1e-6 град, Σr в 1e-3 км)
+_LON_DIST_TERMS = (
+    (0, 0, 1, 0, 6288774, -20905355),
+    (2, 0, -1, 0, 1274027, -3699111),
+    (2, 0, 0, 0, 658314, -2955968),
+    (0, 0, 2, 0, 213618, -569925),
+    (0, 1, 0, 0, -185116, 48888),
+    (0, 0, 0, 2, -114332, -3149),
+    (2, 0, -2, 0, 58793, 246158),
+    (2, -1, -1, 0, 57066, -152138),
+    (2, 0, 1, 0, 53322, -170733),
+    (2, -1, 0, 0, 45758, -204586),
+    (0, 1, -1, 0, -40923, -129620),
+    (1, 0, 0, 0, -34720, 108743),
+    (0, 1, 1, 0, -30383, 104755),
+    (2, 0, 0, -2, 15327, 10321),
+    (0, 0, 1, 2, -12528, 0),
+    (0, 0, 1, -2, 10980, 79661),
+    (4, 0, -1, 0, 10675, -34782),
+    (0, 0, 3, 0, 10034, -23210),
+    (4, 0, -2, 0, 8548, -21636),
+    (2, 1, -1, 0, -7888, 24208),
+    (2, 1, 0, 0, -6766, 30824),
+    (1, 0, -1, 0, -5163, -8379),
+    (1, 1, 0, 0, 4987, -16675),
+    (2, -1, 1, 0, 4036, -12831),
+    (2, 0, 2, 0, 3994, -10445),
+    (4, 0, 0, 0, 3861, -11650),
+    (2, 0, -3, 0, 3665, 14403),
+    (0, 1, -2, 0, -2689, -7003),
+    (2, 0, -1, 2, -2602, 0),
+    (2, -1, -2, 0, 2390, 10056),
+    (1, 0, 1, 0, -2348, 6322),
+    (2, -2, 0, 0, 2236, -9884),
+)
+
+# (D, M, M', F, Σb в 1e-6 град)
+_LAT_TERMS = (
+    (0, 0, 0, 1, 5128122),
+    (0, 0, 1, 1, 280602),
+    (0, 0, 1, -1, 277693),
+    (2, 0, 0, -1, 173237),
+    (2, 0, -1, 1, 55413),
+    (2, 0, -1, -1, 46271),
+    (2, 0, 0, 1, 32573),
+    (0, 0, 2, 1, 17198),
+    (2, 0, 1, -1, 9266),
+    (0, 0, 2, -1, 8822),
+    (2, -1, 0, -1, 8216),
+    (2, 0, -2, -1, 4324),
+    (2, 0, 1, 1, 4200),
+    (2, 1, 0, -1, -3359),
+    (2, -1, -1, 1, 2463),
+    (2, -1, 0, 1, 2211),
+    (2, -1, -1, -1, 2065),
+    (0, 1, -1, -1, -1870),
+    (4, 0, -1, -1, 1828),
+    (0, 1, 0, 1, -1794),
+)
+
+
+def _moon_apparent(jde, xp):
+    """Видимые (α, δ) в радианах, расстояние в км и Δψ·cos ε (град) для звёздного времени."""
+    rad = xp.radians
+    T = (jde - _J2000) / 36525.0
+    T2 = T * T
+
+    Lp = (218.3164477 + 481267.88123421 * T - 0.0015786 * T2 + T2 * T / 538841.0) % 360.0
+    D = rad((297.8501921 + 445267.1114034 * T - 0.0018819 * T2 + T2 * T / 545868.0) % 360.0)
+    M = rad((357.5291092 + 35999.0502909 * T - 0.0001536 * T2) % 360.0)
+    Mp = rad((134.9633964 + 477198.8675055 * T + 0.0087414 * T2 + T2 * T / 69699.0) % 360.0)
+    F = rad((93.2720950 + 483202.0175233 * T - 0.0036539 * T2 - T2 * T / 3526000.0) % 360.0)
+    A1 = rad((119.75 + 131.849 * T) % 360.0)
+    A2 = rad((53.09 + 479264.290 * T) % 360.0)
+    A3 = rad((313.45 + 481266.484 * T) % 360.0)
+    E = 1.0 - 0.002516 * T - 0.0000074 * T2
+    Lp_r = rad(Lp)
+
+    sl = 0.0
+    sr = 0.0
+    for d, m, mp, f, cl, cr in _LON_DIST_TERMS:
+        arg = d * D + m * M + mp * Mp + f * F
+        e = E ** abs(m)
+        sl = sl + cl * e * xp.sin(arg)
+        if cr:
+            sr = sr + cr * e * xp.cos(arg)
+
+    sb = 0.0
+    for d, m, mp, f, cb in _LAT_TERMS:
+        sb = sb + cb * E ** abs(m) * xp.sin(d * D + m * M + mp * Mp + f * F)
+
+    sl = sl + 3958 * xp.sin(A1) + 1962 * xp.sin(Lp_r - F) + 318 * xp.sin(A2)
+    sb = (
+        sb - 2235 * xp.sin(Lp_r) + 382 * xp.sin(A3) + 175 * xp.sin(A1 - F)
+        + 175 * xp.sin(A1 + F) + 127 * xp.sin(Lp_r - Mp) - 115 * xp.sin(Lp_r + Mp)
+    )
+
+    dist = 385000.56 + sr / 1000.0
+
+    # нутация и наклон эклиптики (глава 22, точность ~0.5")
+    Om = rad((125.04452 - 1934.136261 * T) % 360.0)
+    Ls = rad((280.4665 + 36000.7698 * T) % 360.0)
+    dpsi = (-17.20 * xp.sin(Om) - 1.32 * xp.sin(2 * Ls) - 0.23 * xp.sin(2 * Lp_r) + 0.21 * xp.sin(2 * Om)) / 3600.0
+    deps = (9.20 * xp.cos(Om) + 0.57 * xp.cos(2 * Ls) + 0.10 * xp.cos(2 * Lp_r) - 0.09 * xp.cos(2 * Om)) / 3600.0
+    eps = rad(23.4392911111 - 0.0130041667 * T + deps)
+
+    lam = rad(Lp + sl / 1e6 + dpsi)
+    beta = rad(sb / 1e6)
+
+    ra = xp.arctan2(xp.sin(lam) * xp.cos(eps) - xp.tan(beta) * xp.sin(eps), xp.cos(lam))
+    dec = xp.arcsin(xp.sin(beta) * xp.cos(eps) + xp.cos(beta) * xp.sin(eps) * xp.sin(lam))
+    return ra, dec, dist, dpsi * xp.cos(eps)
+
+
+def _rise_function(jd_ut, xp, lat: float, lon: float):
+    """Геоцентрическая высота Луны минус высота восхода h0 (рад); > 0 — Луна над горизонтом."""
+    rad = xp.radians
+    ra, dec, dist, eq_eq = _moon_apparent(jd_ut + DELTA_T_SEC / 86400.0, xp)
+
+    d = jd_ut - _J2000
+    T = d / 36525.0
+    theta = (280.46061837 + 360.98564736629 * d + 0.000387933 * T * T + eq_eq + lon) % 360.0
+    H = rad(theta) - ra
+
+    phi = math.radians(lat)
+    sin_h = math.sin(phi) * xp.sin(dec) + math.cos(phi) * xp.cos(dec) * xp.cos(H)
+    h = xp.arcsin(sin_h)
+
+    # рефракция, полудиаметр и параллакс (глава 15): h0 = 0.7275·π − 0°34′
+    parallax = xp.arcsin(6378.14 / dist)
+    return h - (0.7275 * parallax - rad(0.5667))
+
+
+def moonrise_times(start_ts: float, end_ts: float, lat: float, lon: float) -> list[float]:
+    """Восходы Луны (UTC timestamp) в [start_ts, end_ts) для точки lat/lon (град, восточная долгота +)."""
+    jd0 = _jd_from_ts(start_ts) - RISE_STEP_DAYS
+    n = int((_jd_from_ts(end_ts) - jd0) / RISE_STEP_DAYS) + 2
+    fn = lambda jd, xp: _rise_function(jd, xp, lat, lon)  # noqa: E731
+
+    if np is not None:
+        grid = jd0 + np.arange(n) * RISE_STEP_DAYS
+        f = fn(grid, np)
+        idx = np.nonzero((f[:-1] < 0) & (f[1:] >= 0))[0]
+        t0, t1, f0, f1 = grid[idx], grid[idx + 1], f[idx], f[idx + 1]
+        # линейная интерполяция внутри шага + один шаг секущих по уточнённому концу
+        tm = t0 - f0 * (t1 - t0) / (f1 - f0)
+        fm = fn(tm, np)
+        below = fm < 0
+        ta = np.where(below, tm, t0)
+        fa = np.where(below, fm, f0)
+        tb = np.where(below, t1, tm)
+        fb = np.where(below, f1, fm)
+        safe = np.where(fb - fa == 0, 1.0, fb - fa)
+        rises = np.where(fb - fa == 0, tm, ta - fa * (tb - ta) / safe)
+        out = [_ts_from_jd(jd) for jd in rises.tolist()]
+    else:
+        grid = [jd0 + i * RISE_STEP_DAYS for i in range(n)]
+        f = [fn(jd, _ScalarMath) for jd in grid]
+        out = []
+        for i in range(n - 1):
+            if not (f[i] < 0 <= f[i + 1]):
+                continue
+            t0, t1, f0, f1 = grid[i], grid[i + 1], f[i], f[i + 1]
+            tm = t0 - f0 * (t1 - t0) / (f1 - f0)
+            fm = fn(tm, _ScalarMath)
+            ta, fa, tb, fb = (tm, fm, t1, f1) if fm < 0 else (t0, f0, tm, fm)
+            out.append(_ts_from_jd(tm if fb == fa else ta - fa * (tb - ta) / (fb - fa)))
+
+    return [t for t in out if start_ts <= t < end_ts]
+
+
+# ---- события года + дисковый кеш ----
+_YEARS: dict[tuple[int, float, float], dict[str, list[float]]] = {}
+_YEARS_LOCK = threading.Lock()
+
+
+def _data_dir() -> Path:
+    # project_root/ data/
+    data_dir = Path(__file__).resolve().parents[2] / "data"
+    data_dir.mkdir(parents=True, exist_ok=True)
+    return data_dir
+
+
+def _year_bounds(year: int) -> tuple[float, float]:
+    start = datetime(year, 1, 1, tzinfo=timezone.utc).timestamp()
+    end = datetime(year + 1, 1, 1, tzinfo=timezone.utc).timestamp()
+    return start, end
+
+
+def compute_year(year: int, lat: float, lon: float) -> dict[str, list[float]]:
+    """Фазы и восходы Луны за календарный год (UTC), без кеша."""
+    start, end = _year_bounds(year)
+    events = {phase: phase_times(phase, start, end) for phase in PHASES}
+    events["moonrise"] = moonrise_times(start, end, lat, lon)
+    return events
+
+
+def _cache_path(year: int, lat: float, lon: float) -> Path:
+    return _data_dir() / f"lunar_ephemeris_{year}_{lat:.4f}_{lon:.4f}.json"
+
+
+def _load_cached(path: Path, year: int, lat: float, lon: float) -> dict[str, list[float]] | None:
+    try:
+        raw = json.loads(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except Exception:
+        # если файл повредился — просто посчитаем заново
+        return None
+    if raw.get("version") != CACHE_VERSION or raw.get("year") != year:
+        return None
+    if raw.get("lat") != lat or raw.get("lon") != lon:
+        return None
+    events = raw.get("events") or {}
+    if set(events) != set(PHASES) | {"moonrise"}:
+        return None
+    return {k: [float(t) for t in v] for k, v in events.items()}
+
+
+def _save_cached(path: Path, year: int, lat: float, lon: float, events: dict[str, list[float]]) -> None:
+    payload = {"version": CACHE_VERSION, "year": year, "lat": lat, "lon": lon, "events": events}
+    # пишем во временный файл и подменяем — чтобы не получить обрезанный JSON;
+    # имя временного файла своё у каждого процесса (воркеры считают год одновременно)
+    tmp = None
+    try:
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=path.parent,
+            prefix=path.name + ".", suffix=".tmp", delete=False,
+        ) as f:
+            tmp = f.name
+            json.dump(payload, f)
+        os.replace(tmp, path)
+    except OSError:
+        logger.exception("lunar ephemeris: save failed (%s)", path.name)
+        if tmp is not None:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+def year_events(year: int, lat: float = LUNAR_LAT, lon: float = LUNAR_LON) -> dict[str, list[float]]:
+    """События года: из памяти, с диска (data/lunar_ephemeris_*.json) или свежий расчёт."""
+    key = (year, lat, lon)
+    with _YEARS_LOCK:
+        events = _YEARS.get(key)
+        if events is not None:
+            return events
+
+        path = _cache_path(year, lat, lon)
+        events = _load_cached(path, year, lat, lon)
+        if events is None:
+            events = compute_year(year, lat, lon)
+            _save_cached(path, year, lat, lon, events)
+        _YEARS[key] = events
+        return events
+
+
+if __name__ == "__main__":
+    # Точность и скорость: python -m modules.lunar_day.ephemeris
+    import time
+
+    def _ts(s: str) -> float:
+        return datetime.fromisoformat(s).replace(tzinfo=timezone.utc).timestamp()
+
+    # Пример 49.a из книги: новолуние 1977-02-18 03:37:42 TD
+    jde = _phase_jde(-283.0, _ScalarMath, "new")
+    print(f"Meeus 49.a: JDE {jde:.5f} (книга 2443192.65118)")
+    assert abs(jde - 2443192.65118) < 1e-5
+
+    # Пример 47.a: 1992-04-12 0h TD -> α = 134.688470°, δ = 13.768368°, Δ = 368409.7 км
+    ra, dec, dist, _ = _moon_apparent(2448724.5, _ScalarMath)
+    print(f"Meeus 47.a: α {math.degrees(ra):.4f}° δ {math.degrees(dec):.4f}° Δ {dist:.0f} км "
+          "(книга 134.6885° 13.7684° 368410 км)")
+    assert abs(math.degrees(ra) - 134.688470) < 0.03 and abs(math.degrees(dec) - 13.768368) < 0.03
+
+    # Опубликованные моменты фаз (затмения, UTC с точностью до минуты)
+    published = [
+        ("new", "2017-08-21T18:30"),
+        ("full", "2022-11-08T11:02"),
+        ("new", "2024-04-08T18:21"),
+        ("full", "2024-09-18T02:34"),
+        ("full", "2025-03-14T06:55"),
+        ("new", "2025-03-29T10:58"),
+    ]
+    syn = 29.530588853 * 86400.0
+    ref_new = _ts("2000-01-06T18:14")
+    worst_meeus = worst_mean = 0.0
+    for phase, when in published:
+        expected = _ts(when)
+        got = phase_times(phase, expected - 86400 * 3, expected + 86400 * 3)[0]
+        # старая модель: средний синодический месяц от одного новолуния 2000 года
+        shift = 0.0 if phase == "new" else syn / 2.0
+        n = round((expected - ref_new - shift) / syn)
+        mean = ref_new + shift + n * syn
+        worst_meeus = max(worst_meeus, abs(got - expected))
+        worst_mean = max(worst_mean, abs(mean - expected))
+    print(f"фазы: ошибка Меёса до {worst_meeus / 60:.1f} мин, средней модели до {worst_mean / 3600:.1f} ч")
+    assert worst_meeus < 120
+
+    year = datetime.now(timezone.utc).year
+    t = time.perf_counter()
+    events = compute_year(year, LUNAR_LAT, LUNAR_LON)
+    fast = time.perf_counter() - t
+    print(f"год {year}: {len(events['new'])} новолуний, {len(events['moonrise'])} восходов; "
+          f"расчёт {fast * 1000:.0f} мс ({'numpy' if np is not None else 'без numpy'})")
+
+    if np is not None:
+        saved, np = np, None
+        t = time.perf_counter()
+        slow_events = compute_year(year, LUNAR_LAT, LUNAR_LON)
+        slow = time.perf_counter() - t
+        np = saved
+        diff = max(abs(a - b) for k in events for a, b in zip(events[k], slow_events[k]))
+        assert all(len(events[k]) == len(slow_events[k]) for k in events)
+        print(f"без numpy: {slow * 1000:.0f} мс, расхождение {diff:.3f} с")
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import logging
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from .ephemeris import year_events
+
+logger = logging.getLogger(__name__)
+
+# Лунные сутки:
+#   1-е — от новолуния до первого восхода Луны после него,
+#   дальше — от восхода до восхода; последние заканчиваются в следующее новолуние.
+# Фазы — окна вокруг истинных моментов: новолуние/полнолуние ±1 сутки, четверти ±0.8 суток.
+
+DAY_SEC = 86400.0
+_PHASE_WINDOWS = {
+    # фаза -> (полуширина окна в сутках, название в окне, название после окна)
+    "new": (1.0, "Новолуние (около)", "Растущая Луна"),
+    "first_quarter": (0.8, "Первая четверть", "Растущая Луна"),
+    "full": (1.0, "Полнолуние (около)", "Убывающая Луна"),
+    "last_quarter": (0.8, "Последняя четверть", "Убывающая Луна"),
+}
+
+# Таблица покрывает прошлый, текущий и следующий календарный год и перестраивается,
+# когда до края остаётся меньше REBUILD_MARGIN_DAYS.
+REBUILD_MARGIN_DAYS = 30
+
+
+@dataclass(frozen=True)
+class LunarTable:
+    """Заранее посчитанные события (UTC timestamp) на окно [lo, hi]; только чтение."""
+
+    lo: float
+    hi: float
+    day_starts: tuple[float, ...]   # начало каждых лунных суток (+ конец последних)
+    day_numbers: tuple[int, ...]    # номер суток (1..30) для day_starts[i]
+    new_moons: tuple[float, ...]
+    full_moons: tuple[float, ...]
+    phase_starts: tuple[float, ...]
+    phase_names: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class LunarInfo:
+    lunar_day: int
+    start_ts: float
+    end_ts: float
+    phase_name: str
+    next_new_ts: float
+    next_full_ts: float
+
+
+def build_table(year: int) -> LunarTable:
+    events: dict[str, list[float]] = {}
+    for y in (year - 1, year, year + 1):
+        for name, times in year_events(y).items():
+            events.setdefault(name, []).extend(times)
+
+    new_moons = events["new"]
+    rises = events["moonrise"]
+
+    day_starts: list[float] = []
+    day_numbers: list[int] = []
+    for new_ts, next_new_ts in zip(new_moons, new_moons[1:]):
+        day_starts.append(new_ts)
+        day_numbers.append(1)
+        j = bisect_right(rises, new_ts)
+        while j < len(rises) and rises[j] < next_new_ts:
+            day_starts.append(rises[j])
+            day_numbers.append(day_numbers[-1] + 1)
+            j += 1
+    # конец последних суток в таблице (номер не используется)
+    day_starts.append(new_moons[-1])
+    day_numbers.append(1)
+
+    marks = sorted((t, phase) for phase in _PHASE_WINDOWS for t in events[phase])
+    phase_starts: list[float] = []
+    phase_names: list[str] = []
+    for t, phase in marks:
+        half, inside, after = _PHASE_WINDOWS[phase]
+        phase_starts += [t - half * DAY_SEC, t + half * DAY_SEC]
+        phase_names += [inside, after]
+
+    return LunarTable(
+        lo=new_moons[0],
+        hi=new_moons[-1],
+        day_starts=tuple(day_starts),
+        day_numbers=tuple(day_numbers),
+        new_moons=tuple(new_moons),
+        full_moons=tuple(events["full"]),
+        phase_starts=tuple(phase_starts),
+        phase_names=tuple(phase_names),
+    )
+
+
+def lookup(table: LunarTable, ts: float) -> LunarInfo:
+    """Лунные сутки, фаза и ближайшие новолуние/полнолуние — бинарным поиском по таблице."""
+    i = bisect_right(table.day_starts, ts) - 1
+    p = bisect_right(table.phase_starts, ts) - 1
+    return LunarInfo(
+        lunar_day=table.day_numbers[i],
+        start_ts=table.day_starts[i],
+        end_ts=table.day_starts[i + 1],
+        phase_name=table.phase_names[p],
+        next_new_ts=table.new_moons[bisect_left(table.new_moons, ts)],
+        next_full_ts=table.full_moons[bisect_left(table.full_moons, ts)],
+    )
+
+
+# ---- текущая таблица ----
+_TABLE: LunarTable | None = None
+_TABLE_LOCK = threading.Lock()
+
+
+def get_table(ts: float) -> LunarTable:
+    """Таблица, покрывающая ts; перестраивается, когда ts подходит к краю окна."""
+    global _TABLE
+    margin = REBUILD_MARGIN_DAYS * DAY_SEC
+    table = _TABLE
+    if table is not None and table.lo + margin <= ts <= table.hi - margin:
+        return table
+
+    with _TABLE_LOCK:
+        table = _TABLE
+        if table is None or not (table.lo + margin <= ts <= table.hi - margin):
+            table = build_table(datetime.fromtimestamp(ts, timezone.utc).year)
+            _TABLE = table
+    return table
+
+
+def lunar_info_at(ts: float) -> LunarInfo:
+    return lookup(get_table(ts), ts)
+
+
+def warm_up() -> None:
+    """Посчитать (или поднять с диска) эфемериды заранее, чтобы первый запрос не ждал."""
+    try:
+        get_table(datetime.now(timezone.utc).timestamp())
+    except Exception:
+        logger.exception("lunar table warm-up failed")
+
+
+if __name__ == "__main__":
+    # Проверка таблицы и микробенчмарк: python -m modules.lunar_day.lunar_table
+    import random
+    import timeit
+
+    now_ts = datetime.now(timezone.utc).timestamp()
+    table = build_table(datetime.fromtimestamp(now_ts, timezone.utc).year)
+
+    # в каждом лунном месяце 29 или 30 суток, номера идут подряд
+    lengths = []
+    n = 0
+    for num in table.day_numbers[:-1]:
+        if num == 1 and n:
+            lengths.append(n)
+        n = num
+    lengths.append(n)
+    assert set(lengths) <= {29, 30}, lengths
+    assert all(b > a for a, b in zip(table.day_starts, table.day_starts[1:]))
+    assert all(b > a for a, b in zip(table.phase_starts, table.phase_starts[1:]))
+    print(f"{len(lengths)} лунных месяцев: {lengths.count(29)} по 29 суток, {lengths.count(30)} по 30")
+
+    rnd = random.Random(42)
+    samples = [rnd.uniform(table.lo, table.hi - DAY_SEC * 30) for _ in range(20000)]
+    for ts in samples:
+        info = lookup(table, ts)
+        assert info.start_ts <= ts < info.end_ts and 1 <= info.lunar_day <= 30
+        assert ts <= info.next_new_ts and ts <= info.next_full_ts
+
+    fast = timeit.timeit(lambda: [lookup(table, t) for t in samples], number=1)
+    print(f"lookup: {fast / len(samples) * 1e6:.1f} us/call")
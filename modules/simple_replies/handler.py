@@ -1,11 +1,19 @@
 import random
 from core.actions import OutText
+from core.router import MatchSpec
+from .matcher import TriggerMatcher
 from .rules import RULES
 
+# Все триггеры компилируются один раз при импорте; порядок RULES = приоритет
+_MATCHER = TriggerMatcher([rule["triggers"] for rule in RULES])
+
+# Fallback-модуль: автомат сам и есть дешёвая проверка, поэтому смотрит любой текст
+MATCH_SPEC = MatchSpec(any_text=True)
+
 
 async def get_simple_reply(text: str, user_id: int, chat_id: int, source: str = "unknown"):
     low = (text or "").lower()
-    for rule in RULES:
-        if any(t in low for t in rule["triggers"]):
-            return [OutText(random.choice(rule["responses"]))]
-    return None
+    idx = _MATCHER.first_match(low)
+    if idx is None:
+        return None
+    return [OutText(random.choice(RULES[idx]["responses"]))]
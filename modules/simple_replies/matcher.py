@@ -0,0 +1,132 @@
+from collections import deque
+
+
+class TriggerMatcher:
+    """
+    Автомат Ахо–Корасик по триггерам всех правил.
+
+    Строится один раз, затем за один проход по тексту находит правило
+    с наименьшим индексом (т.е. с наивысшим приоритетом), у которого
+    хотя бы один триггер входит в текст как подстрока.
+    Результат совпадает с
+        next(i for i, rule in enumerate(rules) if any(t in text for t in rule))
+    но стоимость не зависит от количества триггеров.
+    """
+
+    def __init__(self, trigger_lists: list[list[str]]):
+        self._none = len(trigger_lists)  # "нет совпадения" — больше любого индекса
+
+        # бор: переходы, суффиксные ссылки, лучший (минимальный) индекс правила в состоянии
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._best: list[int] = [self._none]
+
+        for idx, triggers in enumerate(trigger_lists):
+            for trig in triggers:
+                self._add(trig, idx)
+
+        self._link()
+
+    def _add(self, trig: str, idx: int) -> None:
+        s = 0
+        for ch in trig:
+            nxt = self._goto[s].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[s][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._best.append(self._none)
+            s = nxt
+        if idx < self._best[s]:
+            self._best[s] = idx
+
+    def _link(self) -> None:
+        goto, fail, best = self._goto, self._fail, self._best
+
+        # BFS: суффиксная ссылка родителя уже посчитана
+        queue = deque(goto[0].values())
+        while queue:
+            s = queue.popleft()
+            # в состоянии "заканчиваются" и все триггеры по цепочке суффиксных ссылок
+            if best[fail[s]] < best[s]:
+                best[s] = best[fail[s]]
+            for ch, nxt in goto[s].items():
+                f = fail[s]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                cand = goto[f].get(ch, 0)
+                # у детей корня ссылка всегда на корень
+                fail[nxt] = cand if cand != nxt else 0
+                queue.append(nxt)
+
+    def first_match(self, text: str) -> int | None:
+        """Индекс первого по приоритету сработавшего правила или None."""
+        goto, fail, best = self._goto, self._fail, self._best
+        found = best[0]  # пустой триггер срабатывает на любом тексте
+        if found == 0:
+            return 0
+
+        s = 0
+        for ch in text:
+            while True:
+                nxt = goto[s].get(ch)
+                if nxt is not None:
+                    s = nxt
+                    break
+                if not s:
+                    break
+                s = fail[s]
+
+            b = best[s]
+            if b < found:
+                found = b
+                if not found:
+                    break  # лучше правила 0 ничего не будет
+
+        return found if found < self._none else None
+
+
+def _naive_first_match(trigger_lists: list[list[str]], text: str) -> int | None:
+    for idx, triggers in enumerate(trigger_lists):
+        if any(t in text for t in triggers):
+            return idx
+    return None
+
+
+if __name__ == "__main__":
+    # Микробенчмарк: python -m modules.simple_replies.matcher
+    import random
+    import timeit
+
+    from modules.simple_replies.rules import RULES
+
+    rnd = random.Random(42)
+    base = [list(r["triggers"]) for r in RULES]
+    words = [t for ts in base for t in ts]
+    alphabet = "абвгдеёжзийклмнопрстуфхцчшщъыьэюя "
+
+    def _noise(n: int) -> str:
+        return "".join(rnd.choice(alphabet) for _ in range(n))
+
+    texts = [_noise(rnd.randint(5, 80)) for _ in range(2000)]
+    texts += [_noise(rnd.randint(0, 30)) + rnd.choice(words) + _noise(rnd.randint(0, 30)) for _ in range(500)]
+
+    for extra in (0, 1000, 5000):
+        lists = [list(ts) for ts in base]
+        # синтетические правила в конец списка (самый медленный случай для наивного перебора)
+        for _ in range(extra // 5):
+            lists.append([_noise(rnd.randint(6, 14)).strip() or "щщщщщщ" for _ in range(5)])
+
+        matcher = TriggerMatcher(lists)
+        for t in texts:
+            assert matcher.first_match(t) == _naive_first_match(lists, t), t
+
+        n_trig = sum(len(ts) for ts in lists)
+        naive = timeit.timeit(lambda: [_naive_first_match(lists, t) for t in texts], number=3)
+        fast = timeit.timeit(lambda: [matcher.first_match(t) for t in texts], number=3)
+        per = 3 * len(texts)
+        print(
+            f"triggers={n_trig:6d}  naive={naive / per * 1e6:8.2f} us/msg  "
+            f"automaton={fast / per * 1e6:8.2f} us/msg  (results equal)"
+        )
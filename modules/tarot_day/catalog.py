@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Mapping
+
+from settings import TAROT_HOT_RELOAD, TAROT_RELOAD_CHECK_SEC
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+
+@dataclass(frozen=True)
+class TarotCard:
+    filename: str     # image12.jpg
+    path: str         # абсолютный путь к картинке
+    description: str  # "" если описания нет
+    size: int
+    mtime: float
+
+
+@dataclass(frozen=True)
+class TarotCatalog:
+    """Неизменяемый снимок колоды: собирается один раз, дальше только чтение."""
+
+    images_dir_exists: bool
+    cards: tuple[TarotCard, ...]
+    by_name: Mapping[str, TarotCard]
+    # (mtime папки, mtime descriptions.txt, ((имя, размер, mtime_ns) каждой картинки, ...));
+    # по файлам — потому что замена картинки под тем же именем mtime папки не меняет
+    signature: tuple
+
+
+def _images_dir() -> Path:
+    # Папка с картинками: modules/tarot_day/images
+    return Path(__file__).resolve().parent / "images"
+
+
+def _descriptions_file() -> Path:
+    # Текстовый файл с описаниями: modules/tarot_day/descriptions.txt
+    return Path(__file__).resolve().parent / "descriptions.txt"
+
+
+def _mtime(path: Path) -> float:
+    try:
+        return path.stat().st_mtime
+    except OSError:
+        return 0.0
+
+
+def _signature() -> tuple:
+    images_dir = _images_dir()
+    files = []
+    try:
+        with os.scandir(images_dir) as it:
+            for e in it:
+                if not e.is_file() or Path(e.name).suffix.lower() not in IMAGE_SUFFIXES:
+                    continue
+                st = e.stat()
+                files.append((e.name, st.st_size, st.st_mtime_ns))
+    except OSError:
+        pass
+    return (_mtime(images_dir), _mtime(_descriptions_file()), tuple(sorted(files)))
+
+
+def _load_descriptions() -> dict[str, str]:
+    """Читает descriptions.txt с поддержкой переносов строк.
+
+    ✅ РЕКОМЕНДУЕМЫЙ формат (многострочный):
+        image1.jpg|Первая строка
+        Вторая строка
+
+        Третий абзац (пустая строка выше сохранится)
+
+        image2.jpg|...
+
+    То есть:
+      - новая запись начинается со строки "imageX.jpg|" (или "imageX.jpg:"),
+      - все следующие строки до следующего "imageY..." относятся к этому описанию,
+      - пустые строки сохраняются (будут абзацы).
+
+    Также поддерживаем старый однострочный формат и литералы "\\n".
+    """
+    path = _descriptions_file()
+    if not path.exists():
+        return {}
+
+    out: dict[str, str] = {}
+    current_name: str | None = None
+    buf: list[str] = []
+
+    def _flush():
+        nonlocal current_name, buf
+        if not current_name:
+            return
+        text = "\n".join(buf).strip("\n").replace("\\n", "\n")
+        if text:
+            out[current_name] = text
+        current_name = None
+        buf = []
+
+    for raw_line in path.read_text(encoding="utf-8").splitlines():
+        # важно: не .strip(), чтобы не уничтожать пустые строки (абзацы)
+        line = raw_line.rstrip("\n")
+
+        # комментарии пропускаем (но только если это отдельная строка)
+        if line.strip().startswith("#"):
+            continue
+
+        # новая запись? (image*.jpg| ... или image*.png: ...)
+        head = line.split("|", 1)[0].split(":", 1)[0].strip()
+        is_new = bool(re.match(r"^image\d+\.(jpg|jpeg|png)$", head, re.IGNORECASE)) and ("|" in line or ":" in line)
+
+        if is_new:
+            _flush()
+            if "|" in line:
+                name, first = line.split("|", 1)
+            else:
+                name, first = line.split(":", 1)
+            current_name = name.strip()
+            buf = [first.lstrip()]  # первый кусок описания
+            continue
+
+        # продолжение текущего описания
+        if current_name is not None:
+            buf.append(line)
+
+    _flush()
+    return out
+
+
+def _find_description(descriptions: dict[str, str], name: str) -> str:
+    desc = descriptions.get(name) or descriptions.get(name.lower())
+    if not desc:
+        # fallback: ищем по номеру image12.jpg -> 12
+        m = re.match(r"^image(\d+)\.(jpg|jpeg|png)$", name, re.IGNORECASE)
+        if m:
+            desc = descriptions.get(f"image{m.group(1)}.jpg", "")
+    return desc or ""
+
+
+def _build_catalog() -> TarotCatalog:
+    images_dir = _images_dir()
+    signature = _signature()
+
+    if not images_dir.exists():
+        return TarotCatalog(False, (), MappingProxyType({}), signature)
+
+    descriptions = _load_descriptions()
+
+    cards = []
+    for p in sorted(images_dir.iterdir(), key=lambda x: x.name):
+        if not p.is_file() or p.suffix.lower() not in IMAGE_SUFFIXES:
+            continue
+        st = p.stat()
+        cards.append(
+            TarotCard(
+                filename=p.name,
+                path=str(p.resolve()),
+                description=_find_description(descriptions, p.name),
+                size=st.st_size,
+                mtime=st.st_mtime,
+            )
+        )
+
+    return TarotCatalog(
+        images_dir_exists=True,
+        cards=tuple(cards),
+        by_name=MappingProxyType({c.filename: c for c in cards}),
+        signature=signature,
+    )
+
+
+_catalog: TarotCatalog = _build_catalog()
+_checked_at = time.monotonic()
+_reload_lock = threading.Lock()
+
+
+def get_catalog() -> TarotCatalog:
+    """
+    Колода, собранная при импорте модуля (т.е. на старте приложения).
+    С TAROT_HOT_RELOAD=1 не чаще раза в TAROT_RELOAD_CHECK_SEC сверяем mtime папки,
+    descriptions.txt и размер/mtime каждой картинки и пересобираем снимок, если что-то поменялось.
+    """
+    global _catalog, _checked_at
+    if not TAROT_HOT_RELOAD:
+        return _catalog
+
+    now = time.monotonic()
+    if now - _checked_at < TAROT_RELOAD_CHECK_SEC:
+        return _catalog
+
+    with _reload_lock:
+        if now - _checked_at >= TAROT_RELOAD_CHECK_SEC:
+            _checked_at = now
+            if _signature() != _catalog.signature:
+                _catalog = _build_catalog()
+    return _catalog
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import json
+import sqlite3
+import threading
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+
+from settings import TAROT_STATE_BACKEND
 
 
 @dataclass
@@ -17,57 +20,200 @@ def _today_utc() -> str:
     return datetime.now(timezone.utc).date().isoformat()
 
 
-def _state_path() -> Path:
-    # project_root/ data/ tarot_day_state.json
+def _data_dir() -> Path:
+    # project_root/ data/
     project_root = Path(__file__).resolve().parents[2]
     data_dir = project_root / "data"
     data_dir.mkdir(parents=True, exist_ok=True)
-    return data_dir / "tarot_day_state.json"
+    return data_dir
 
 
-def _load_raw() -> dict[str, Any]:
-    path = _state_path()
-    if not path.exists():
-        return {}
-    try:
-        return json.loads(path.read_text(encoding="utf-8")) or {}
-    except Exception:
-        # если файл повредился — начнем с чистого
-        return {}
+def _norm_source(source: str) -> str:
+    return str(source or "").strip().lower() or "unknown"
 
 
-def _save_raw(data: dict[str, Any]) -> None:
-    path = _state_path()
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+# ---------------- SQLite (по умолчанию) ----------------
 
+class _SqliteBackend:
+    """
+    data/tarot_day_state.sqlite3 в режиме WAL.
+    Ключ (source, user_id, day) — поиск по первичному ключу, без чтения всего файла.
+    У каждого потока своё соединение (sqlite3 не любит делить их между потоками).
+    """
 
-def _user_key(user_id: int, source: str) -> str:
-    source = str(source or "").strip().lower() or "unknown"
-    return f"{source}:{int(user_id)}"
+    def __init__(self, path: Path):
+        self._path = path
+        self._local = threading.local()
+        fresh = not path.exists()
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tarot_daily (
+                source  TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                day     TEXT NOT NULL,
+                card    TEXT NOT NULL,
+                PRIMARY KEY (source, user_id, day)
+            )
+            """
+        )
+        conn.commit()
+        if fresh:
+            self._import_legacy_json(conn)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self._path), timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _import_legacy_json(self, conn: sqlite3.Connection) -> None:
+        # старый формат: {"tg:123": {"date": "...", "card": "..."}}; нужны только сегодняшние записи
+        legacy = self._path.with_name("tarot_day_state.json")
+        try:
+            raw = json.loads(legacy.read_text(encoding="utf-8")) or {}
+        except Exception:
+            return
+        today = _today_utc()
+        rows = []
+        for key, rec in raw.items():
+            if not isinstance(rec, dict) or rec.get("date") != today or not rec.get("card"):
+                continue
+            source, _, uid = str(key).rpartition(":")
+            try:
+                rows.append((source or "unknown", int(uid), today, str(rec["card"])))
+            except ValueError:
+                continue
+        if rows:
+            conn.executemany("INSERT OR IGNORE INTO tarot_daily VALUES (?, ?, ?, ?)", rows)
+            conn.commit()
+
+    def get(self, source: str, user_id: int, day: str) -> str | None:
+        row = self._conn().execute(
+            "SELECT card FROM tarot_daily WHERE source=? AND user_id=? AND day=?",
+            (source, user_id, day),
+        ).fetchone()
+        return row[0] if row else None
+
+    def claim(self, source: str, user_id: int, day: str, card: str) -> tuple[str, bool]:
+        conn = self._conn()
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO tarot_daily (source, user_id, day, card) VALUES (?, ?, ?, ?)",
+            (source, user_id, day, card),
+        )
+        conn.commit()
+        if cur.rowcount == 1:
+            return card, True
+        return self.get(source, user_id, day) or card, False
+
+    def put(self, source: str, user_id: int, day: str, card: str) -> None:
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO tarot_daily (source, user_id, day, card) VALUES (?, ?, ?, ?)",
+            (source, user_id, day, card),
+        )
+        conn.commit()
+
+    def reset(self, source: str, user_id: int, day: str) -> bool:
+        conn = self._conn()
+        cur = conn.execute(
+            "DELETE FROM tarot_daily WHERE source=? AND user_id=? AND day=?",
+            (source, user_id, day),
+        )
+        conn.commit()
+        return cur.rowcount > 0
+
+    def prune(self, before_day: str) -> None:
+        conn = self._conn()
+        conn.execute("DELETE FROM tarot_daily WHERE day < ?", (before_day,))
+        conn.commit()
+
+
+# ---------------- Postgres ----------------
+
+class _PgBackend:
+    """Та же таблица в общем Postgres (core/chat_store_pg.py) — переживает редеплой."""
+
+    def __init__(self):
+        from core import chat_store_pg as pg
+
+        self._pg = pg
+
+    def get(self, source: str, user_id: int, day: str) -> str | None:
+        return self._pg.tarot_get_card(source, user_id, day)
+
+    def claim(self, source: str, user_id: int, day: str, card: str) -> tuple[str, bool]:
+        return self._pg.tarot_claim_card(source, user_id, day, card)
+
+    def put(self, source: str, user_id: int, day: str, card: str) -> None:
+        self._pg.tarot_put_card(source, user_id, day, card)
+
+    def reset(self, source: str, user_id: int, day: str) -> bool:
+        return self._pg.tarot_reset_card(source, user_id, day)
+
+    def prune(self, before_day: str) -> None:
+        self._pg.tarot_prune_cards(before_day)
+
+
+_backend_obj = None
+_backend_lock = threading.Lock()
+_pruned_day: str | None = None
+
+
+def _backend():
+    global _backend_obj
+    if _backend_obj is None:
+        with _backend_lock:
+            if _backend_obj is None:
+                if TAROT_STATE_BACKEND == "pg":
+                    _backend_obj = _PgBackend()
+                else:
+                    _backend_obj = _SqliteBackend(_data_dir() / "tarot_day_state.sqlite3")
+    return _backend_obj
+
+
+def _maybe_prune(today: str) -> None:
+    """Раз в сутки (на процесс) удаляем записи за прошлые дни — они больше не нужны."""
+    global _pruned_day
+    if _pruned_day == today:
+        return
+    _pruned_day = today
+    try:
+        _backend().prune(today)
+    except Exception:
+        _pruned_day = None
 
 
 def get_today_card_for_user(user_id: int, source: str) -> TarotDailyState | None:
     """Возвращает карту пользователя на сегодня, если уже выдавали."""
-    raw = _load_raw()
-    key = _user_key(user_id, source)
-    rec = raw.get(key)
-    if not isinstance(rec, dict):
+    today = _today_utc()
+    card = _backend().get(_norm_source(source), int(user_id), today)
+    if not card:
         return None
-    if rec.get("date") != _today_utc():
-        return None
-    card = rec.get("card")
-    if not isinstance(card, str) or not card:
-        return None
-    return TarotDailyState(date=rec["date"], card=card)
+    return TarotDailyState(date=today, card=card)
+
+
+def claim_today_card_for_user(user_id: int, source: str, card_filename: str) -> tuple[TarotDailyState, bool]:
+    """Атомарно "одна карта в день": записывает карту, только если сегодня ещё не выдавали.
+
+    Возвращает (состояние, True), если карта выдана сейчас, или
+    (уже выданная сегодня карта, False), если кто-то успел раньше
+    (например, параллельный запрос того же пользователя).
+    """
+    today = _today_utc()
+    _maybe_prune(today)
+    card, created = _backend().claim(_norm_source(source), int(user_id), today, card_filename)
+    return TarotDailyState(date=today, card=card), created
 
 
 def set_today_card_for_user(user_id: int, source: str, card_filename: str) -> TarotDailyState:
-    raw = _load_raw()
-    key = _user_key(user_id, source)
-    state = TarotDailyState(date=_today_utc(), card=card_filename)
-    raw[key] = {"date": state.date, "card": state.card}
-    _save_raw(raw)
-    return state
+    today = _today_utc()
+    _maybe_prune(today)
+    _backend().put(_norm_source(source), int(user_id), today, card_filename)
+    return TarotDailyState(date=today, card=card_filename)
 
 
 def reset_today_card_for_user(user_id: int, source: str) -> bool:
@@ -78,10 +224,4 @@ def reset_today_card_for_user(user_id: int, source: str) -> bool:
 
     Возвращает True, если запись была и мы её удалили. False, если удалять было нечего.
     """
-    raw = _load_raw()
-    key = _user_key(user_id, source)
-    if key not in raw:
-        return False
-    raw.pop(key, None)
-    _save_raw(raw)
-    return True
+    return _backend().reset(_norm_source(source), int(user_id), _today_utc())
@@ -1,20 +1,28 @@
 import random
 import re
+import time
 from datetime import datetime
 from zoneinfo import ZoneInfo
 
+from core import roster
 from core.actions import OutText
+from core.router import MatchSpec
+from .selection import DEFAULT_WEIGHTING, choose
 
 TZ_NAME = "Europe/Moscow"
 
 # ловим "кто сегодня" где угодно
 WHO_RE = re.compile(r"(?:^|[\s,!.?])кто\s+сегодня\b", re.IGNORECASE)
 
+STATS_TRIGGERS = {"/who_stats", "кто сегодня статистика", "статистика кто сегодня", "статистика титулов"}
+
+MATCH_SPEC = MatchSpec(exact=frozenset(STATS_TRIGGERS), patterns=(WHO_RE,))
+
 # удалим мусор в конце титула
 TRAIL_PUNCT_RE = re.compile(r"[?!.,:;]+$")
 
 
-def _today_msk():
+def today_msk():
     return datetime.now(ZoneInfo(TZ_NAME)).date()
 
 
@@ -102,11 +110,10 @@ def _pg_funcs():
     """
     try:
         from core.chat_store_pg import (
-            init_who_today_tables,
-            get_available_users_for_today,
+            scan_candidates_for_today,
             assign_title_today,
         )
-        return init_who_today_tables, get_available_users_for_today, assign_title_today
+        return scan_candidates_for_today, assign_title_today
     except Exception:
         return None
 
@@ -118,7 +125,7 @@ def get_who_today_reply(text: str, platform: str, chat_id: int, user_id: int):
     low = text.strip().lower()
 
     # ---------- статистика по титулу в этом чате ----------
-    if low in {"/who_stats", "кто сегодня статистика", "статистика кто сегодня", "статистика титулов"}:
+    if low in STATS_TRIGGERS:
         if not _is_group_chat(platform, chat_id):
             return [OutText("📊 Статистика доступна только в групповых чатах/беседах.")]
 
@@ -153,44 +160,63 @@ def get_who_today_reply(text: str, platform: str, chat_id: int, user_id: int):
     if not pg:
         return [OutText("😕 Модуль «Кто сегодня» пока недоступен (Postgres не подключен).")]
 
-    init_tables, get_users, assign = pg
-
-    try:
-        init_tables()
-    except Exception:
-        return [OutText("😕 Не получилось открыть базу для «Кто сегодня».")]
-
-    day = _today_msk()
+    scan_pg, assign = pg
+
+    day = today_msk()
+    now = time.time()
+
+    # Взвешенная выборка по всем активным участникам (свежесть + сколько раз уже получал титул).
+    # 🔥 Правило “не назначать самому себе” — только если есть выбор (см. selection.choose).
+    # Кандидаты — из памяти (core/roster); из Postgres, только если кеш не прогрелся на старте.
+    def _pick(active_since: float) -> list[tuple[int, str | None]]:
+        if roster.is_warm():
+            rows = roster.candidates(platform, chat_id, day, active_since)
+            return choose(rows, int(user_id), now=now)
+        return scan_pg(
+            platform, chat_id, day, active_since,
+            lambda rows: choose(rows, int(user_id), now=now),
+            roster.pick_counts(platform, chat_id),
+        )
 
     try:
-        candidates_all = get_users(platform, chat_id, day, limit=200)
+        candidates = _pick(DEFAULT_WEIGHTING.active_since(now))
+        if not candidates and DEFAULT_WEIGHTING.active_days > 0:
+            # среди недавно писавших свободных нет — выбираем из всех, кого знаем
+            candidates = _pick(0.0)
     except Exception:
         return [OutText("😕 Не получилось получить список участников для этого чата.")]
 
+    known = roster.size(platform, chat_id) if roster.is_warm() else len(candidates)
+
     # если вообще никого не знаем (обычно: бот только что добавлен/после деплоя)
-    if not candidates_all:
+    if not known:
         return [OutText("🙂 Я пока не знаю участников этого чата. Пусть несколько людей напишут любые сообщения — и попробуй ещё раз.")]
 
-    # 🔥 Правило “не назначать самому себе” — только если есть выбор
-    candidates = [(uid, nm) for (uid, nm) in candidates_all if int(uid) != int(user_id)]
-    if not candidates:
-        # если кроме автора никого нет — назначаем автору (иначе всегда будет “раздал”)
-        candidates = candidates_all
-
-    # если всё равно пусто (на всякий случай)
-    if not candidates:
+    # в БД уходит только запись титула; если его этому человеку сегодня уже выдал
+    # другой воркер (память догоняет базу не сразу), берём следующего из выборки
+    chosen = None
+    for chosen_id, chosen_name in candidates:
+        try:
+            inserted = assign(platform, chat_id, day, chosen_id, title)
+            counted = True
+        except Exception:
+            # даже если не записали — лучше ответить, чем молчать; но в счётчик
+            # титулов не записанное не идёт, иначе человека зря отодвинет в выборке
+            inserted = True
+            counted = False
+        roster.mark_assigned(platform, chat_id, day, chosen_id, count=counted)
+        if inserted:
+            chosen = (chosen_id, chosen_name)
+            break
+
+    # все известные участники уже с титулом на сегодня
+    # (или все из выборки успели получить его через другие воркеры)
+    if chosen is None:
         fallbacks = _read_lines("modules/who_today/fallbacks.txt")
         if not fallbacks:
             fallbacks = ["😄 На сегодня я уже всем раздал титулы. Завтра продолжим!"]
         return [OutText(random.choice(fallbacks))]
-
-    chosen_id, chosen_name = random.choice(candidates)
-
-    try:
-        assign(platform, chat_id, day, chosen_id, title)
-    except Exception:
-        # даже если не записали — лучше ответить, чем молчать
-        pass
+    chosen_id, chosen_name = chosen
 
     phrases = _read_lines("modules/who_today/phrases.txt")
     if not phrases:
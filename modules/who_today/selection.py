@@ -0,0 +1,137 @@
+import heapq
+import math
+import random
+import time
+from dataclasses import dataclass
+from typing import Iterable
+
+from settings import WHO_TODAY_ACTIVE_DAYS, WHO_TODAY_PICK_PENALTY, WHO_TODAY_RECENCY_HALF_LIFE_DAYS
+
+# Кому выпадает титул: взвешенная случайная выборка по всем активным участникам чата.
+# Выборка — Efraimidis–Spirakis (A-Res): каждому кандидату ключ ln(u) / w, берём k наибольших.
+# Один проход, память O(k), поэтому одинаково работает и по ростеру в памяти,
+# и по серверному курсору Postgres (участники не грузятся в Python целиком).
+
+# (user_id, display_name, last_seen_ts, сколько раз уже получал титул в этом чате)
+Candidate = tuple[int, str | None, float, int]
+
+# сколько кандидатов доставать за раз: первый — основной, остальные — запасные,
+# если титул первому уже выдал другой воркер
+SAMPLE_SIZE = 5
+
+
+@dataclass(frozen=True)
+class Weighting:
+    active_days: float = WHO_TODAY_ACTIVE_DAYS
+    recency_half_life_days: float = WHO_TODAY_RECENCY_HALF_LIFE_DAYS
+    pick_penalty: float = WHO_TODAY_PICK_PENALTY
+
+    def active_since(self, now: float) -> float:
+        """Нижняя граница last_seen для кандидатов (0 — без ограничения)."""
+        if self.active_days <= 0:
+            return 0.0
+        return now - self.active_days * 86400.0
+
+    def weight(self, last_seen: float, picks: int, now: float) -> float:
+        w = 1.0
+        if self.recency_half_life_days > 0:
+            idle_days = max(0.0, now - last_seen) / 86400.0
+            w *= 0.5 ** (idle_days / self.recency_half_life_days)
+        if self.pick_penalty > 0:
+            w /= (1 + picks) ** self.pick_penalty
+        return w
+
+
+DEFAULT_WEIGHTING = Weighting()
+
+
+def weighted_sample(
+    rows: Iterable[Candidate],
+    k: int = SAMPLE_SIZE,
+    weighting: Weighting = DEFAULT_WEIGHTING,
+    now: float | None = None,
+    rng: random.Random | None = None,
+) -> list[tuple[int, str | None]]:
+    """До k кандидатов без повторов, с вероятностью пропорционально весу; первый — основной выбор."""
+    now = time.time() if now is None else now
+    rnd = rng.random if rng is not None else random.random
+    log, exp = math.log, math.exp
+
+    # ключ ln(u) / w считаем как ln(u) * (1 / w): 1 / w = exp(decay * простой) * (1 + picks) ** penalty
+    decay = 0.0
+    if weighting.recency_half_life_days > 0:
+        decay = math.log(2.0) / (weighting.recency_half_life_days * 86400.0)
+    penalty = max(weighting.pick_penalty, 0.0)
+
+    heap: list[tuple[float, int, str | None]] = []
+    for user_id, name, last_seen, picks in rows:
+        inv_w = 1.0
+        if decay and last_seen < now:
+            # потолок — чтобы exp не переполнился на очень старых last_seen
+            inv_w = exp(min(decay * (now - last_seen), 700.0))
+        if penalty and picks:
+            inv_w *= (1 + picks) ** penalty
+        key = log(1.0 - rnd()) * inv_w
+        if len(heap) < k:
+            heapq.heappush(heap, (key, user_id, name))
+        elif key > heap[0][0]:
+            heapq.heapreplace(heap, (key, user_id, name))
+
+    heap.sort(reverse=True)
+    return [(user_id, name) for _key, user_id, name in heap]
+
+
+def choose(
+    rows: Iterable[Candidate],
+    author_id: int,
+    k: int = SAMPLE_SIZE,
+    weighting: Weighting = DEFAULT_WEIGHTING,
+    now: float | None = None,
+    rng: random.Random | None = None,
+) -> list[tuple[int, str | None]]:
+    """weighted_sample без автора сообщения; автор — только если кроме него никого нет."""
+    author: Candidate | None = None
+
+    def _others():
+        nonlocal author
+        for row in rows:
+            if row[0] == author_id:
+                author = row
+                continue
+            yield row
+
+    picked = weighted_sample(_others(), k, weighting, now, rng)
+    if not picked and author is not None:
+        return [(author[0], author[1])]
+    return picked
+
+
+if __name__ == "__main__":
+    # Честность выборки и скорость: python -m modules.who_today.selection
+    import timeit
+    from collections import Counter
+
+    rng = random.Random(42)
+    now = 1_800_000_000.0
+    w = Weighting(active_days=30, recency_half_life_days=7, pick_penalty=1)
+
+    # малый чат: частоты первого выбора должны совпасть с весами
+    small = [
+        (1, "a", now, 0),
+        (2, "b", now - 7 * 86400, 0),
+        (3, "c", now, 1),
+        (4, "d", now - 14 * 86400, 3),
+    ]
+    weights = {uid: w.weight(ts, picks, now) for uid, _n, ts, picks in small}
+    total_w = sum(weights.values())
+    n = 200_000
+    counts = Counter(weighted_sample(small, 1, w, now, rng)[0][0] for _ in range(n))
+    worst = max(abs(counts[uid] / n - wt / total_w) for uid, wt in weights.items())
+    print("частоты:", {uid: round(counts[uid] / n, 4) for uid in weights},
+          "ожидание:", {uid: round(wt / total_w, 4) for uid, wt in weights.items()})
+    assert worst < 0.005, worst
+
+    # большой чат: 10k активных участников
+    big = [(uid, None, now - rng.random() * 30 * 86400, rng.randrange(5)) for uid in range(10_000)]
+    per_call = timeit.timeit(lambda: choose(big, author_id=0, weighting=w, now=now, rng=rng), number=50) / 50
+    print(f"10k участников: {per_call * 1000:.2f} мс на выбор")
@@ -2,6 +2,9 @@ import os
 
 ANGEL_TIME_TZ = os.getenv("ANGEL_TIME_TZ", "Europe/Moscow")
 LUNAR_TZ = os.getenv("LUNAR_TZ", "Europe/Moscow")
+# точка для восходов Луны (лунные сутки); по умолчанию Москва, долгота восточная
+LUNAR_LAT = float(os.getenv("LUNAR_LAT", "55.7558"))
+LUNAR_LON = float(os.getenv("LUNAR_LON", "37.6173"))
 
 
 VK_TOKEN = os.getenv("VK_TOKEN", "")
@@ -16,6 +19,82 @@ TYPING_DELAY_MIN = 3
 TYPING_DELAY_MAX = 6
 
 
+# --- Postgres (пул соединений) ---
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+# соединение, пролежавшее в пуле дольше этого, перед выдачей проверяется SELECT 1
+DB_HEALTHCHECK_IDLE_SEC = int(os.getenv("DB_HEALTHCHECK_IDLE_SEC", "30"))
+
+# --- отложенная запись активности (known_chats / chat_users) ---
+# буфер сбрасывается в БД раз в ACTIVITY_FLUSH_MS или когда набралось ACTIVITY_FLUSH_ROWS ключей
+ACTIVITY_FLUSH_MS = int(os.getenv("ACTIVITY_FLUSH_MS", "2000"))
+ACTIVITY_FLUSH_ROWS = int(os.getenv("ACTIVITY_FLUSH_ROWS", "500"))
+# сколько несохранённых попаданий в ангельское время держать, пока БД недоступна (старые отбрасываются)
+ACTIVITY_ANGEL_BACKLOG_MAX = int(os.getenv("ACTIVITY_ANGEL_BACKLOG_MAX", "50000"))
+
+# --- пул потоков для блокирующей работы модулей (БД, файлы, HTTP) ---
+# это же и лимит одновременно выполняющихся блокирующих обработчиков
+MODULE_WORKERS = int(os.getenv("MODULE_WORKERS", "16"))
+# потоки под HTTP-запросы к Telegram/VK (держатся только на время запроса)
+SEND_WORKERS = int(os.getenv("SEND_WORKERS", "16"))
+
+# --- очередь исходящих ответов ---
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "64"))       # сколько чатов обслуживаем одновременно
+DELIVERY_QUEUE_MAX = int(os.getenv("DELIVERY_QUEUE_MAX", "2000"))  # дальше submit() ждёт место
+TG_SEND_CONCURRENCY = int(os.getenv("TG_SEND_CONCURRENCY", "8"))  # одновременных HTTP-вызовов к Telegram
+VK_SEND_CONCURRENCY = int(os.getenv("VK_SEND_CONCURRENCY", "8"))  # одновременных HTTP-вызовов к VK
+
+# --- обработка входящих (сборка ответа после того, как webhook уже ответил) ---
+PROCESS_CONCURRENCY = int(os.getenv("PROCESS_CONCURRENCY", "32"))  # одновременно собираемых ответов
+PROCESS_QUEUE_MAX = int(os.getenv("PROCESS_QUEUE_MAX", "1000"))    # дальше webhook ждёт место
+
+# --- лимиты платформ на отправку ---
+TG_RATE_GLOBAL = float(os.getenv("TG_RATE_GLOBAL", "30"))              # сообщений/с на бота
+TG_RATE_GROUP_PER_MIN = float(os.getenv("TG_RATE_GROUP_PER_MIN", "20"))  # сообщений/мин в одну группу
+TG_RATE_PRIVATE = float(os.getenv("TG_RATE_PRIVATE", "1"))             # сообщений/с в одну личку
+VK_RATE_GLOBAL = float(os.getenv("VK_RATE_GLOBAL", "20"))              # запросов/с на токен сообщества
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "5"))             # повторы после 429 / VK error 6
+# 429 на ответ из очереди доставки — остаток ответа возвращается в очередь чата
+# и ждёт retry_after в event loop (не больше стольких раз подряд)
+SEND_MAX_REQUEUES = int(os.getenv("SEND_MAX_REQUEUES", "5"))
+
+# --- админские рассылки ---
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "10"))          # чатов в секунду
+BROADCAST_MAX_ATTEMPTS = int(os.getenv("BROADCAST_MAX_ATTEMPTS", "3"))  # попыток на один чат
+# рассылку ведёт один воркер; без heartbeat дольше BROADCAST_LEASE_SEC её забирает другой
+BROADCAST_LEASE_SEC = float(os.getenv("BROADCAST_LEASE_SEC", "60"))
+
+# --- карта дня: где хранить "кому сегодня уже выдали" ---
+# "sqlite" — локальный файл data/tarot_day_state.sqlite3, "pg" — общий Postgres (DATABASE_URL)
+TAROT_STATE_BACKEND = os.getenv("TAROT_STATE_BACKEND", "sqlite").strip().lower()
+
+# --- карта дня: перечитывать картинки/описания без рестарта (для разработки) ---
+TAROT_HOT_RELOAD = os.getenv("TAROT_HOT_RELOAD", "").strip().lower() in {"1", "true", "yes"}
+TAROT_RELOAD_CHECK_SEC = float(os.getenv("TAROT_RELOAD_CHECK_SEC", "5"))
+
+# --- исходящий HTTP (Telegram / VK) ---
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))   # keep-alive соединений на хост
+# повторы на ошибки соединения; на 5xx — только запросы к VK (у Telegram повтор дал бы дубль);
+# 429 обрабатывают rate limiter'ы отправителей
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))    # 0.5, 1, 2 ... секунд между повторами
+
+# --- гороскоп: во сколько (МСК) заранее скачивать тексты на новый день ---
+HOROSCOPE_PREFETCH_AT = os.getenv("HOROSCOPE_PREFETCH_AT", "00:05")
+# сколько страниц abc-moon.ru можно качать одновременно
+HOROSCOPE_FETCH_CONCURRENCY = int(os.getenv("HOROSCOPE_FETCH_CONCURRENCY", "4"))
+
+# --- "Кто сегодня": кому выпадает титул ---
+# кандидаты — писавшие в чат за последние WHO_TODAY_ACTIVE_DAYS дней (0 — все известные)
+WHO_TODAY_ACTIVE_DAYS = float(os.getenv("WHO_TODAY_ACTIVE_DAYS", "30"))
+# вес свежести: вдвое меньше за каждые N дней молчания (0 — не учитывать)
+WHO_TODAY_RECENCY_HALF_LIFE_DAYS = float(os.getenv("WHO_TODAY_RECENCY_HALF_LIFE_DAYS", "7"))
+# вес истории: 1 / (1 + сколько раз уже получал титул) ** PENALTY (0 — не учитывать)
+WHO_TODAY_PICK_PENALTY = float(os.getenv("WHO_TODAY_PICK_PENALTY", "1"))
+# как часто участники и титулы в памяти (core/roster) догоняют базу — там пишут и другие воркеры
+ROSTER_REFRESH_SEC = float(os.getenv("ROSTER_REFRESH_SEC", "30"))
+
+
 ADMIN_TG_IDS = os.getenv("ADMIN_TG_IDS", "")  # например "123,456"
 ADMIN_VK_IDS = os.getenv("ADMIN_VK_IDS", "")  # например "111,222"
 